@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'priority',
+        'attempts',
+        'run_at',
+    )
+    list_filter = ('status', 'name')
+    readonly_fields = (
+        'name', 'args', 'locked_by', 'locked_at', 'last_error', 'created',
+    )
+
+
+admin.site.register(Job, JobAdmin)
@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Задачи очереди регистрируются при импорте модулей tasks.py.
+        autodiscover_modules('tasks')
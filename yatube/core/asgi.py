@@ -0,0 +1,184 @@
+import asyncio
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Тело запроса больше этого размера пишется во временный файл.
+BODY_MEMORY_LIMIT = 1024 * 1024
+# Сколько кусков потокового ответа может ждать медленного клиента,
+# прежде чем поток view остановится.
+RESPONSE_QUEUE_SIZE = 16
+
+
+class ClientDisconnected(OSError):
+    """Клиент ушёл, не дочитав ответ."""
+
+
+class ASGIHandler:
+    """ASGI-приложение поверх WSGI-приложения Django.
+
+    Django 2.2 не умеет ни ASGI, ни асинхронные view, поэтому view
+    выполняются в ограниченном пуле потоков, а чтение тела запроса
+    и отправка ответа идут в цикле событий. Медленный клиент держит
+    только соединение, а не поток с view: один процесс обслуживает
+    много соединений одновременно."""
+
+    def __init__(self, wsgi_application, max_workers):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        environ = self.get_environ(scope, body)
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(RESPONSE_QUEUE_SIZE)
+        cancelled = threading.Event()
+        task = loop.run_in_executor(
+            self.executor, self.run_wsgi, environ, loop, queue, cancelled)
+        watcher = asyncio.ensure_future(
+            self.watch_disconnect(receive, cancelled))
+        message = {}
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                if not cancelled.is_set():
+                    await send(message)
+        finally:
+            # Ошибка send или уход клиента: поток с view перестаёт
+            # отправлять ответ, а очередь разбирается до конца, чтобы
+            # он не остался навсегда ждать в ней места.
+            cancelled.set()
+            watcher.cancel()
+            while message is not None:
+                message = await queue.get()
+            await task
+            body.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Тело запроса целиком или None, если клиент ушёл, не дослав
+        его: view с обрезанным телом сохранил бы обрезанный пост."""
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_LIMIT)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    async def watch_disconnect(self, receive, cancelled):
+        # После тела запроса receive() вернёт только http.disconnect.
+        while not cancelled.is_set():
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                cancelled.set()
+
+    def get_environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            # WSGI ждёт байты пути, записанные как latin-1.
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+                environ[name] = value
+                continue
+            key = f'HTTP_{name}'
+            if key in environ:
+                value = f'{environ[key]},{value}'
+            environ[key] = value
+        return environ
+
+    def run_wsgi(self, environ, loop, queue, cancelled):
+        """Выполняется в пуле: вызывает view и передаёт ответ в цикл
+        событий. Весь ответ, включая close() с сигналом request_finished,
+        обрабатывается в одном потоке, как в WSGI-сервере. Если клиент
+        ушёл, чтение потокового ответа прерывается."""
+        def send(message):
+            asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+        def put(message):
+            if cancelled.is_set():
+                raise ClientDisconnected
+            send(message)
+
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            start['status'] = int(status.split(' ', 1)[0])
+            start['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        try:
+            response = self.wsgi_application(environ, start_response)
+            try:
+                self.send_response(response, start, put)
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+        except ClientDisconnected:
+            pass
+        finally:
+            send(None)
+
+    def send_response(self, response, start, put):
+        # Заголовки уходят с первым куском: до него view ещё может
+        # вызвать start_response.
+        started = False
+        for chunk in response:
+            if not started:
+                put({'type': 'http.response.start', **start})
+                started = True
+            if chunk:
+                put({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        if not started:
+            put({'type': 'http.response.start', **start})
+        put({'type': 'http.response.body', 'body': b''})
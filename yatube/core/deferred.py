@@ -0,0 +1,29 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AfterResponse:
+    """Вызов, который сервер выполнит при закрытии ответа, то есть
+    уже после отправки его клиенту, но до сигнала request_finished:
+    подключение к базе ещё открыто."""
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def close(self):
+        # Django молча глотает исключения из close(), поэтому пишем их
+        # в лог сами.
+        try:
+            self.func(*self.args, **self.kwargs)
+        except Exception:
+            logger.exception('Ошибка в отложенном вызове %r', self.func)
+            raise
+
+
+def after_response(response, func, *args, **kwargs):
+    """Откладывает func(*args, **kwargs) до отправки response."""
+    response._closable_objects.append(AfterResponse(func, args, kwargs))
+    return response
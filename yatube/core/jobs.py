@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class LockLost(Exception):
+    """Задание, пока выполнялось, вернули в очередь или взял
+    другой воркер."""
+
+
+class Task:
+    """Функция, выполнение которой можно отложить: task.defer(*args).
+    Аргументы сохраняются в JSON, поэтому передаются id, а не объекты.
+
+    Пакетная задача (batch=True) принимает список кортежей аргументов
+    и за один вызов обрабатывает все выбранные воркером задания
+    с этим именем, например складывает их одним запросом."""
+
+    def __init__(self, func, priority, max_attempts, batch):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.batch = batch
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+    def run(self, args_list):
+        if self.batch:
+            self.func(args_list)
+            return
+        for args in args_list:
+            self.func(*args)
+
+    def defer(self, *args, priority=None, delay=0):
+        """Ставит задание в очередь. При JOBS_ASYNC = False выполняет
+        его сразу, как без очереди."""
+        if not settings.JOBS_ASYNC:
+            self.run([args])
+            return None
+        return Job.objects.create(
+            name=self.name,
+            args=json.dumps(args),
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+
+def task(func=None, *, priority=0, max_attempts=5, batch=False):
+    """Регистрирует функцию модуля tasks.py как задачу очереди.
+    Чем больше priority, тем раньше воркер возьмёт задание."""
+    def decorator(func):
+        registered = Task(func, priority, max_attempts, batch)
+        registry[registered.name] = registered
+        return registered
+
+    return decorator(func) if func is not None else decorator
+
+
+def retry_delay(attempts):
+    """Экспоненциальная пауза перед следующей попыткой."""
+    return timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+class Worker:
+    """Выбирает задания из очереди пачками и выполняет их.
+
+    Задание захватывается условным UPDATE по статусу, поэтому
+    несколько воркеров не возьмут одно и то же. Каждое задание (или
+    пакет заданий пакетной задачи) выполняется в одной транзакции
+    со своим удалением: при ошибке откатывается и то, и другое.
+
+    Перед каждым заданием воркер обновляет locked_at, чтобы живое
+    задание не сочли брошенным. Если его всё же вернули в очередь,
+    удаление найдёт чужую блокировку и транзакция откатится: изменения
+    в базе зафиксирует только один воркер."""
+
+    def __init__(self, batch_size=100, name=None):
+        self.batch_size = batch_size
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+
+    def requeue_stale(self, now):
+        # Задания воркера, который умер посреди работы.
+        stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+        return Job.objects.filter(
+            status=Job.RUNNING, locked_at__lt=stale
+        ).update(status=Job.QUEUED, locked_by='', locked_at=None)
+
+    def claim(self):
+        now = timezone.now()
+        self.requeue_stale(now)
+        ids = list(
+            Job.objects.filter(
+                status=Job.QUEUED, run_at__lte=now
+            ).order_by('-priority', 'run_at', 'pk').values_list(
+                'pk', flat=True)[:self.batch_size]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=self.name, locked_at=now)
+        return list(
+            Job.objects.filter(
+                pk__in=ids, status=Job.RUNNING,
+                locked_by=self.name, locked_at=now,
+            ).order_by('-priority', 'run_at', 'pk')
+        )
+
+    def run_once(self):
+        """Выполняет одну пачку заданий и возвращает их число."""
+        jobs = self.claim()
+        groups = {}
+        for job in jobs:
+            groups.setdefault(job.name, []).append(job)
+        for name, group in groups.items():
+            self.run_group(name, group)
+        return len(jobs)
+
+    def run_group(self, name, jobs):
+        """Пакетная задача сначала получает все задания разом. Если
+        пакет упал, задания выполняются по одному, чтобы попытку
+        потратило только сломанное, а остальные не откатились."""
+        registered = registry.get(name)
+        if registered is None:
+            logger.error('Неизвестная задача %s', name)
+            self.fail(jobs, f'Неизвестная задача {name}')
+            return
+        if registered.batch and len(jobs) > 1:
+            try:
+                self.run_jobs(registered, jobs)
+                return
+            except Exception:
+                logger.warning(
+                    'Пакет %s из %d заданий упал, выполняем по одному',
+                    name, len(jobs), exc_info=True)
+        for job in jobs:
+            try:
+                self.run_jobs(registered, [job])
+            except LockLost:
+                logger.warning('Задание %s забрал другой воркер', job)
+            except Exception:
+                logger.exception('Задание %s упало', job)
+                self.fail([job], traceback.format_exc())
+
+    def owned(self, jobs):
+        return Job.objects.filter(
+            pk__in=[job.pk for job in jobs],
+            status=Job.RUNNING,
+            locked_by=self.name,
+        )
+
+    def run_jobs(self, registered, jobs):
+        # Продление блокировки должно быть видно другим воркерам сразу,
+        # поэтому идёт до транзакции.
+        self.owned(jobs).update(locked_at=timezone.now())
+        # Изменения задачи и удаление заданий фиксируются вместе.
+        with transaction.atomic():
+            registered.run([tuple(json.loads(job.args)) for job in jobs])
+            deleted, _ = self.owned(jobs).delete()
+            if deleted != len(jobs):
+                raise LockLost
+
+    def fail(self, jobs, error):
+        now = timezone.now()
+        for job in jobs:
+            attempts = job.attempts + 1
+            changes = {'status': Job.FAILED}
+            if attempts < job.max_attempts:
+                changes = {
+                    'status': Job.QUEUED,
+                    'run_at': now + retry_delay(attempts),
+                }
+            # Задание, которое уже забрал другой воркер, не трогаем.
+            self.owned([job]).update(
+                attempts=attempts,
+                last_error=error,
+                locked_by='',
+                locked_at=None,
+                **changes,
+            )
+
+    def run(self, once=False, sleep=1.0):
+        """Обрабатывает очередь; с once=True - пока она не опустеет."""
+        processed = 0
+        while True:
+            count = self.run_once()
+            processed += count
+            if not count:
+                if once:
+                    return processed
+                # Долгоживущему процессу нужно, как и запросу, закрывать
+                # устаревшие подключения.
+                close_old_connections()
+                time.sleep(sleep)
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import Worker
+from core.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер очереди отложенных задач: миниатюры, счётчики, ленты, '
+        'поисковый индекс и почта. Нужен при JOBS_ASYNC = True.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выйти, когда очередь опустеет.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Сколько заданий брать из очереди за раз.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза в секундах, если очередь пуста.',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Вернуть в очередь задания, исчерпавшие попытки.',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = Job.objects.filter(status=Job.FAILED).update(
+                status=Job.QUEUED, attempts=0)
+            self.stdout.write(f'Возвращено в очередь: {requeued}')
+        worker = Worker(batch_size=options['batch_size'])
+        processed = worker.run(once=options['once'], sleep=options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено заданий: {processed}'))
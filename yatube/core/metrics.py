@@ -0,0 +1,167 @@
+import bisect
+import threading
+from collections import defaultdict
+
+# Границы корзин по умолчанию, в секундах.
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+
+
+class QueryCounter:
+    """Считает SQL-запросы через connection.execute_wrapper."""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+        for name, value in pairs
+    )
+    return '{%s}' % ','.join(f'{name}="{value}"' for name, value in escaped)
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        with self.lock:
+            lines.extend(self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values = defaultdict(int)
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] += amount
+
+    def get(self, **labels):
+        return self.values.get(self.key(labels), 0)
+
+    def samples(self):
+        for key, value in sorted(self.values.items()):
+            labels = format_labels(self.label_names, key)
+            yield f'{self.name}{labels} {format_value(value)}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets=DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # На каждую метку: счётчики корзин (последняя - +Inf) и сумма.
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(
+                key, ([0] * (len(self.buckets) + 1), 0))
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        counts, _ = self.values.get(self.key(labels), ((), 0))
+        return sum(counts)
+
+    def samples(self):
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = format_labels(
+                    self.label_names, key, [('le', bound)])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = format_labels(self.label_names, key)
+            yield f'{self.name}_sum{labels} {format_value(float(total))}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+    """Метрики процесса в текстовом формате Prometheus. У каждого
+    воркера свой реестр, Prometheus собирает их по отдельности."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), **kwargs):
+        return self.register(
+            Histogram(name, documentation, labels, **kwargs))
+
+    def render(self):
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.counter(
+    'yatube_requests_total',
+    'Число запросов по имени URL, методу и статусу.',
+    ('view', 'method', 'status'),
+)
+request_duration = registry.histogram(
+    'yatube_request_duration_seconds',
+    'Время ответа по имени URL.',
+    ('view',),
+)
+request_queries = registry.histogram(
+    'yatube_request_sql_queries',
+    'Число SQL-запросов на запрос по имени URL.',
+    ('view',),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+fragment_cache = registry.counter(
+    'yatube_fragment_cache_total',
+    'Попадания и промахи кэша фрагментов по виду области.',
+    ('kind', 'outcome'),
+)
+thumbnail_duration = registry.histogram(
+    'yatube_thumbnail_generation_seconds',
+    'Время создания всех вариантов миниатюры.',
+)
@@ -0,0 +1,103 @@
+import logging
+import os
+import random
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+from . import metrics, profiling
+
+logger = logging.getLogger('yatube.profiling')
+
+
+class SampledProfilingMiddleware:
+    """Замеряет долю PROFILING_SAMPLE_RATE запросов: время view, SQL,
+    шаблонов и миниатюр пишется в лог, а для запросов дольше
+    PROFILING_SLOW_MS свёрнутые стеки (формат flamegraph.pl и speedscope)
+    сохраняются в PROFILING_DIR. Остальные запросы не замедляются."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        profiling.instrument_templates()
+        self.sampler = profiling.StackSampler(
+            settings.PROFILING_INTERVAL_MS / 1000)
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profile = profiling.start()
+        self.sampler.add(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profiling.sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            self.sampler.remove()
+            profiling.stop()
+        self.report(request, response, profile)
+        return response
+
+    def report(self, request, response, profile):
+        breakdown = profile.breakdown()
+        match = request.resolver_match
+        view_name = match.view_name if match else '-'
+        logger.info(
+            '%s %s %s %s %s sql_queries=%d',
+            request.method,
+            request.path,
+            view_name,
+            response.status_code,
+            ' '.join(f'{name}={ms}' for name, ms in breakdown.items()),
+            profile.counts['sql'],
+            extra={'profile': breakdown},
+        )
+        if breakdown['total'] >= settings.PROFILING_SLOW_MS and profile.stacks:
+            self.dump(view_name, profile.stacks)
+
+    def dump(self, view_name, stacks):
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        name = '{}-{}-{}.collapsed'.format(
+            timezone.now().strftime('%Y%m%d-%H%M%S'),
+            view_name.replace(':', '-'),
+            uuid.uuid4().hex[:8],
+        )
+        path = os.path.join(settings.PROFILING_DIR, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in stacks.most_common():
+                file.write(f'{stack} {count}\n')
+        logger.warning('Медленный запрос %s, профиль: %s', view_name, path)
+
+
+class MetricsMiddleware:
+    """Считает запросы, время ответа и число SQL-запросов
+    по имени URL для /metrics/."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = metrics.QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        # Без имени URL (404) все адреса идут под одной меткой,
+        # иначе число меток росло бы с каждым новым адресом.
+        view = match.view_name if match else 'unmatched'
+        metrics.requests_total.inc(
+            view=view, method=request.method, status=response.status_code)
+        metrics.request_duration.observe(duration, view=view)
+        metrics.request_queries.observe(queries.count, view=view)
+        return response
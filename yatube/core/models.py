@@ -1,12 +1,85 @@
 from django.db import models
+from django.utils import timezone
+
+
+class CreatedQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Массовое изменение тоже сдвигает дату изменения. Чтобы её
+        не трогать (например, для счётчиков), передайте
+        updated_at=F('updated_at')."""
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+    update.alters_data = True
+
+    def changed_since(self, moment):
+        """Записи, созданные или изменённые позже moment. Удалённые
+        записи сюда не попадают. Для следующей выборки сохраните
+        наибольший updated_at из полученных записей."""
+        return self.filter(updated_at__gt=moment)
 
 
 class CreatedModel(models.Model):
-    """Абстрактная модель. Добавляет дату создания."""
+    """Абстрактная модель. Добавляет дату создания и дату изменения."""
     pub_date = models.DateTimeField(
         'Дата создания',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
+
+    objects = CreatedQuerySet.as_manager()
 
     class Meta:
         abstract = True
+
+
+class Job(models.Model):
+    """Отложенная задача из core.jobs. Выполненные задачи удаляются,
+    в таблице остаются ожидающие, выполняемые и упавшие."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    args = models.TextField('Аргументы (JSON)', default='[]')
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    status = models.CharField(
+        'Состояние',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    run_at = models.DateTimeField('Выполнить после', default=timezone.now)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Наибольшее число попыток',
+        default=5,
+    )
+    locked_by = models.CharField('Воркер', max_length=100, blank=True)
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+
+    class Meta:
+        ordering = ('-priority', 'run_at', 'pk')
+        indexes = [
+            # Выборка воркера: очередь по приоритету и времени.
+            models.Index(
+                fields=['status', '-priority', 'run_at'],
+                name='job_queue_idx',
+            ),
+        ]
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,133 @@
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class Profile:
+    """Замер одного запроса: собственное время разделов (SQL, шаблоны,
+    миниатюры) без вложенных и свёрнутые стеки сэмплера."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sections = defaultdict(float)
+        self.counts = Counter()
+        self.stacks = Counter()
+        self.stack = []
+
+    def enter(self):
+        self.stack.append([time.perf_counter(), 0.0])
+
+    def exit(self, name):
+        started, children = self.stack.pop()
+        elapsed = time.perf_counter() - started
+        self.sections[name] += elapsed - children
+        self.counts[name] += 1
+        if self.stack:
+            self.stack[-1][1] += elapsed
+
+    def breakdown(self):
+        """Время разделов в мс; 'view' - всё, что не попало в разделы."""
+        total = time.perf_counter() - self.started
+        result = {
+            name: round(seconds * 1000, 3)
+            for name, seconds in self.sections.items()
+        }
+        result['view'] = round(
+            (total - sum(self.sections.values())) * 1000, 3)
+        result['total'] = round(total * 1000, 3)
+        return result
+
+
+def active_profile():
+    return getattr(_local, 'profile', None)
+
+
+def start():
+    _local.profile = Profile()
+    return _local.profile
+
+
+def stop():
+    _local.profile = None
+
+
+@contextmanager
+def section(name):
+    """Отмечает раздел запроса. Вне замера почти ничего не стоит."""
+    profile = active_profile()
+    if profile is None:
+        yield
+        return
+    profile.enter()
+    try:
+        yield
+    finally:
+        profile.exit(name)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    with section('sql'):
+        return execute(sql, params, many, context)
+
+
+def instrument_templates():
+    """Один раз оборачивает Template.render в раздел 'template'."""
+    from django.template.base import Template
+    if getattr(Template.render, 'profiled', False):
+        return
+    render = Template.render
+
+    def profiled_render(template, context):
+        with section('template'):
+            return render(template, context)
+
+    profiled_render.profiled = True
+    Template.render = profiled_render
+
+
+def frame_name(frame):
+    return f'{frame.f_globals.get("__name__", "?")}.{frame.f_code.co_name}'
+
+
+class StackSampler:
+    """Общий фоновый поток, который раз в interval секунд снимает стеки
+    потоков с активным замером."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.profiles = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add(self, profile):
+        with self.lock:
+            self.profiles[threading.get_ident()] = profile
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='profiling-sampler', daemon=True)
+                self.thread.start()
+
+    def remove(self):
+        with self.lock:
+            self.profiles.pop(threading.get_ident(), None)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                profiles = dict(self.profiles)
+            if not profiles:
+                continue
+            frames = sys._current_frames()
+            for thread_id, profile in profiles.items():
+                frame = frames.get(thread_id)
+                names = []
+                while frame is not None:
+                    names.append(frame_name(frame))
+                    frame = frame.f_back
+                if names:
+                    profile.stacks[';'.join(reversed(names))] += 1
@@ -0,0 +1,114 @@
+import time
+from collections import Counter
+from contextlib import ContextDecorator, ExitStack
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.base import Template
+
+DUPLICATES_SHOWN = 5
+
+
+class QueryBudget(ContextDecorator):
+    """Бюджет SQL-запросов блока кода или теста: число запросов,
+    из них выполненных при рендере шаблонов, и суммарное время БД в мс.
+    Работает и как контекстный менеджер, и как декоратор:
+
+        @query_budget(queries=3, render_queries=0)
+        def test_index(self):
+            ...
+
+    При превышении бюджета падает с AssertionError и показывает
+    повторяющиеся запросы - обычно это и есть N+1."""
+
+    def __init__(
+        self, queries=None, render_queries=None, time=None,
+        using=DEFAULT_DB_ALIAS,
+    ):
+        self.max_queries = queries
+        self.max_render_queries = render_queries
+        self.max_time = time
+        self.using = using
+
+    def __enter__(self):
+        self.queries = []
+        self.render_depth = 0
+        self.stack = ExitStack()
+        self.stack.enter_context(
+            connections[self.using].execute_wrapper(self.record))
+        render = Template.render
+        budget = self
+
+        def counted_render(template, context):
+            budget.render_depth += 1
+            try:
+                return render(template, context)
+            finally:
+                budget.render_depth -= 1
+
+        Template.render = counted_render
+        self.stack.callback(setattr, Template, 'render', render)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stack.close()
+        if exc_type is None:
+            self.check()
+        return False
+
+    def record(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((
+                sql,
+                (time.perf_counter() - start) * 1000,
+                self.render_depth > 0,
+            ))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def render_count(self):
+        return sum(in_render for _, _, in_render in self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration, _ in self.queries)
+
+    def check(self):
+        errors = []
+        if self.max_queries is not None and self.count > self.max_queries:
+            errors.append(
+                f'запросов {self.count}, бюджет {self.max_queries}')
+        if (
+            self.max_render_queries is not None
+            and self.render_count > self.max_render_queries
+        ):
+            errors.append(
+                f'запросов из шаблонов {self.render_count}, '
+                f'бюджет {self.max_render_queries}'
+            )
+        if self.max_time is not None and self.duration > self.max_time:
+            errors.append(
+                f'время БД {self.duration:.1f} мс, бюджет {self.max_time} мс')
+        if errors:
+            raise AssertionError(self.report(errors))
+
+    def report(self, errors):
+        lines = ['Превышен бюджет запросов: ' + '; '.join(errors) + '.']
+        duplicates = Counter(sql for sql, _, _ in self.queries)
+        duplicates = [
+            (count, sql)
+            for sql, count in duplicates.most_common(DUPLICATES_SHOWN)
+            if count > 1
+        ]
+        if duplicates:
+            lines.append('Повторяющиеся запросы:')
+            lines.extend(f'  {count} x {sql}' for count, sql in duplicates)
+        return '\n'.join(lines)
+
+
+query_budget = QueryBudget
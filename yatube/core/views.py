@@ -1,5 +1,11 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     context = {
@@ -21,3 +27,24 @@ def server_error(request, template_name='500.html'):
         'title': 'Ошибка 500'
     }
     return render(request, template_name, context)
+
+
+def metrics_allowed(request):
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        return hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', '').encode(),
+            expected.encode(),
+        )
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    """Метрики процесса в текстовом формате Prometheus. Доступны
+    по токену METRICS_TOKEN, а без него - с адресов METRICS_ALLOWED_IPS."""
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,8 +1,18 @@
 from django.contrib import admin
+from .fts import fts_available, fts_filter
 from .models import Post, Group, Comment
 
 
-class PostAdmin(admin.ModelAdmin):
+class FTSSearchMixin:
+    """Поиск в списке объектов через таблицу FTS5 вместо LIKE.
+    Без FTS5 (другая СУБД) работает обычный поиск по search_fields."""
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and fts_available(self.model):
+            return fts_filter(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class PostAdmin(FTSSearchMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -16,7 +26,7 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class PostComment(admin.ModelAdmin):
+class PostComment(FTSSearchMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
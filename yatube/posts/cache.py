@@ -0,0 +1,217 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from core.metrics import fragment_cache
+
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2
+LOCK_POLL_INTERVAL = 0.05
+SCOPE_KINDS = ('index', 'group', 'profile')
+
+_count_executor = None
+_count_lock = threading.Lock()
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(author_id):
+    return f'profile:{author_id}'
+
+
+def post_scope(post_id):
+    """Страница поста с комментариями; для фрагментов не используется,
+    только для ETag."""
+    return f'post:{post_id}'
+
+
+def following_scope(user_id):
+    """Подписки пользователя; версия сдвигается при подписке
+    и отписке."""
+    return f'following:{user_id}'
+
+
+def post_scopes(post):
+    """Области кэша со страницами, на которых выводится пост."""
+    scopes = {'index', profile_scope(post.author_id)}
+    if post.group_id is not None:
+        scopes.add(group_scope(post.group_id))
+    return scopes
+
+
+def version_key(scope):
+    return f'posts:version:{scope}'
+
+
+def get_version(scope):
+    """Текущая версия содержимого области кэша (например, 'index')."""
+    return cache.get_or_set(version_key(scope), new_version, None)
+
+
+def new_version():
+    # Версия от времени, а не с единицы: если ключ версии вытеснят,
+    # новая версия не совпадёт ни с одной из уже закэшированных.
+    return int(time.time() * 1000)
+
+
+def bump_version(*scopes):
+    """Сдвигает версию областей, старые страницы больше не читаются."""
+    for scope in scopes:
+        key = version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), None)
+
+
+def incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def record(scope, outcome):
+    """Учитывает попадание или промах для вида области
+    ('index', 'group', 'profile')."""
+    kind = scope.split(':')[0]
+    incr(f'posts:stats:{kind}:{outcome}')
+    fragment_cache.inc(kind=kind, outcome=outcome)
+
+
+def cache_stats(kinds=SCOPE_KINDS):
+    """Счётчики попаданий и промахов по видам областей."""
+    keys = {
+        (kind, outcome): f'posts:stats:{kind}:{outcome}'
+        for kind in kinds
+        for outcome in ('hits', 'misses')
+    }
+    values = cache.get_many(keys.values())
+    stats = {kind: {'hits': 0, 'misses': 0} for kind in kinds}
+    for (kind, outcome), key in keys.items():
+        stats[kind][outcome] = values.get(key, 0)
+    return stats
+
+
+def reset_cache_stats(kinds=SCOPE_KINDS):
+    cache.delete_many(
+        f'posts:stats:{kind}:{outcome}'
+        for kind in kinds
+        for outcome in ('hits', 'misses')
+    )
+
+
+def fragment_key(scope, vary_on):
+    digest = hashlib.md5(
+        ':'.join(str(value) for value in vary_on).encode()
+    ).hexdigest()
+    return f'posts:fragment:{scope}:{digest}'
+
+
+def get_or_render(scope, vary_on, render):
+    """Возвращает закэшированный фрагмент текущей версии области
+    или рендерит его. Пересобирает фрагмент только один запрос,
+    остальные тем временем получают предыдущую версию."""
+    base_key = fragment_key(scope, vary_on)
+    key = f'{base_key}:{get_version(scope)}'
+    content = cache.get(key)
+    if content is not None:
+        record(scope, 'hits')
+        return content
+    lock_key = f'{key}:lock'
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not locked:
+        stale = cache.get(f'{base_key}:stale')
+        if stale is not None:
+            record(scope, 'hits')
+            return stale
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            content = cache.get(key)
+            if content is not None:
+                record(scope, 'hits')
+                return content
+    record(scope, 'misses')
+    try:
+        content = render()
+        cache.set_many(
+            {key: content, f'{base_key}:stale': content},
+            settings.POSTS_CACHE_TIMEOUT,
+        )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return content
+
+
+def count_key(name):
+    return f'posts:count:{name}'
+
+
+def cached_count(name, count):
+    """Число записей из кэша под именем name ('index', 'group:1').
+    count() выполняется сразу только при промахе; если значение
+    старше PAGINATOR_COUNT_TTL, отдаётся оно, а пересчёт уходит в фон."""
+    value = cache.get(count_key(name))
+    if value is None:
+        return refresh_count(name, count)
+    number, counted_at = value
+    stale = time.time() - counted_at > settings.PAGINATOR_COUNT_TTL
+    if stale and cache.add(f'{count_key(name)}:lock', 1, LOCK_TIMEOUT):
+        if settings.PAGINATOR_COUNT_WORKERS:
+            get_count_executor().submit(
+                refresh_count_in_background, name, count)
+        else:
+            refresh_count(name, count)
+    return number
+
+
+def refresh_count(name, count):
+    try:
+        number = count()
+        cache.set(
+            count_key(name), (number, time.time()),
+            settings.POSTS_CACHE_TIMEOUT,
+        )
+    finally:
+        cache.delete(f'{count_key(name)}:lock')
+    return number
+
+
+def recount(name, count):
+    """Внеочередной пересчёт, например для страницы за последней
+    известной. Выполняется не чаще раза в PAGINATOR_COUNT_TTL на имя,
+    иначе запросы несуществующих страниц снова дают COUNT(*) на каждый
+    запрос. Возвращает None, если пересчёт уже был."""
+    if not cache.add(
+            f'{count_key(name)}:recount', 1, settings.PAGINATOR_COUNT_TTL):
+        return None
+    return refresh_count(name, count)
+
+
+def refresh_count_in_background(name, count):
+    # Фоновый поток держит своё подключение к базе, как запрос.
+    try:
+        refresh_count(name, count)
+    finally:
+        close_old_connections()
+
+
+def get_count_executor():
+    global _count_executor
+    with _count_lock:
+        if _count_executor is None:
+            _count_executor = ThreadPoolExecutor(
+                max_workers=settings.PAGINATOR_COUNT_WORKERS,
+                thread_name_prefix='counts',
+            )
+        return _count_executor
@@ -0,0 +1,64 @@
+import hashlib
+
+from .cache import get_version, group_scope, post_scope, profile_scope
+from .models import Group, Post, User
+from .utils import followed_author_ids
+
+
+def make_etag(request, *parts):
+    """ETag из состояния данных страницы и текущего пользователя:
+    шапка и кнопки зависят от того, кто смотрит страницу."""
+    parts = (request.user.pk, *parts)
+    return hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def group_posts_etag(request, slug):
+    """Без агрегатов по постам: новые, изменённые, удалённые
+    и перенесённые посты, готовые миниатюры и правка группы сдвигают
+    версию области кэша группы."""
+    group = Group.objects.filter(slug=slug).values_list(
+        'pk', 'title', 'description').first()
+    if group is None:
+        return None
+    return make_etag(request, *group, get_version(group_scope(group[0])))
+
+
+def profile_etag(request, username):
+    author = User.objects.filter(username=username).values_list(
+        'pk', 'first_name', 'last_name',
+        'stats__posts_count', 'stats__followers_count',
+    ).first()
+    if author is None:
+        return None
+    # Счётчик подписчиков обновляется после ответа на подписку,
+    # а кнопка должна смениться сразу. Для шаблона подписки уже загружены.
+    following = author[0] in followed_author_ids(request.user)
+    return make_etag(
+        request, *author, following,
+        # Кнопки подписки - формы с CSRF-токеном из куки.
+        request.META.get('CSRF_COOKIE', ''),
+        get_version(profile_scope(author[0])),
+    )
+
+
+def post_detail_etag(request, post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'updated_at', 'text', 'image', 'group__title', 'group__slug',
+        'author_id', 'author__username', 'author__stats__posts_count',
+        'comments_count',
+    ).first()
+    if post is None:
+        return None
+    return make_etag(
+        request,
+        *post,
+        # Форма комментария содержит CSRF-токен из куки.
+        request.META.get('CSRF_COOKIE', ''),
+        # Новые и удалённые комментарии сдвигают версию поста сразу,
+        # даже если comments_count обновит воркер очереди.
+        get_version(post_scope(post_id)),
+        # Версия сдвигается и когда готовы миниатюры картинки.
+        get_version(profile_scope(post[5])),
+    )
@@ -0,0 +1,105 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.text import compress_sequence
+
+from .models import Comment, Follow, Post
+
+# Сколько строк за раз читается из курсора базы.
+EXPORT_CHUNK_SIZE = 2000
+# Строки склеиваются в куски не меньше этого размера: каждый кусок -
+# отдельная запись в сокет и отдельный сброс потока gzip.
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+CSV_FIELDS = (
+    'type', 'id', 'post', 'group', 'author', 'text', 'image',
+    'pub_date', 'updated_at',
+)
+
+
+def export_rows(user, since=None):
+    """Посты, комментарии и подписки пользователя словарями. Строки
+    читаются из базы порциями по EXPORT_CHUNK_SIZE, память не зависит
+    от размера аккаунта. С since - только посты и комментарии,
+    изменённые позже since; подписки выгружаются всегда."""
+    posts = Post.objects.filter(author=user)
+    comments = Comment.objects.filter(author=user)
+    if since is not None:
+        posts = posts.changed_since(since)
+        comments = comments.changed_since(since)
+    posts = posts.order_by('pk').values_list(
+        'pk', 'group__slug', 'text', 'image', 'pub_date', 'updated_at')
+    for pk, group, text, image, pub_date, updated_at in posts.iterator(
+            chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'type': 'post',
+            'id': pk,
+            'group': group,
+            'text': text,
+            'image': image or None,
+            'pub_date': pub_date,
+            'updated_at': updated_at,
+        }
+    comments = comments.order_by('pk').values_list(
+        'pk', 'post', 'text', 'pub_date', 'updated_at')
+    for pk, post, text, pub_date, updated_at in comments.iterator(
+            chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'type': 'comment',
+            'id': pk,
+            'post': post,
+            'text': text,
+            'pub_date': pub_date,
+            'updated_at': updated_at,
+        }
+    follows = Follow.objects.filter(user=user).order_by('pk').values_list(
+        'author__username', flat=True)
+    for author in follows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {'type': 'follow', 'author': author}
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.DictWriter(Echo(), CSV_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def buffered(lines, size=EXPORT_BUFFER_SIZE):
+    """Склеивает строки в куски байтов не меньше size."""
+    chunk = []
+    length = 0
+    for line in lines:
+        data = line.encode()
+        chunk.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(chunk)
+            chunk = []
+            length = 0
+    if chunk:
+        yield b''.join(chunk)
+
+
+def export_stream(user, format_='ndjson', compress=False, since=None):
+    """Экспорт в виде итератора кусков байтов, при compress -
+    сжатых gzip на лету."""
+    lines = ndjson_lines if format_ == 'ndjson' else csv_lines
+    chunks = buffered(lines(export_rows(user, since)))
+    return compress_sequence(chunks) if compress else chunks
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import AuthorStats, FeedItem, Follow, Post
+
+
+def is_celebrity(author):
+    """Посты автора не раскладываются по лентам, а подмешиваются при
+    чтении. Решает сохранённый флаг, а не текущее число подписчиков:
+    иначе посты, опубликованные до смены режима, пропали бы из лент."""
+    return AuthorStats.objects.filter(user=author, feed_pulled=True).exists()
+
+
+def celebrity_authors(user):
+    """Id авторов-знаменитостей среди подписок пользователя."""
+    return list(
+        AuthorStats.objects.filter(
+            user__following__user=user,
+            feed_pulled=True,
+        ).values_list('user', flat=True)
+    )
+
+
+def backfill_followers(author_id):
+    """Раскладывает все посты автора по лентам всех его подписчиков."""
+    posts = list(
+        Post.objects.filter(author=author_id).values_list('pk', 'pub_date'))
+    followers = Follow.objects.filter(
+        author=author_id).values_list('user', flat=True)
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for user_id in followers.iterator()
+            for pk, pub_date in posts
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def update_delivery(author_id):
+    """Переключает автора между раскладкой постов по лентам и
+    подмешиванием при чтении, если число подписчиков пересекло
+    FEED_FANOUT_LIMIT. Возвращает True, если режим сменился.
+
+    К раскладке автор возвращается в одной транзакции с раскладкой
+    всех его постов: опубликованные в режиме подмешивания посты иначе
+    не попали бы в ленты."""
+    with transaction.atomic():
+        stats = AuthorStats.objects.select_for_update().filter(
+            user=author_id).values_list('followers_count', 'feed_pulled')
+        stats = stats.first()
+        if stats is None:
+            return False
+        followers_count, pulled = stats
+        celebrity = followers_count > settings.FEED_FANOUT_LIMIT
+        if celebrity == pulled:
+            return False
+        AuthorStats.objects.filter(user=author_id).update(
+            feed_pulled=celebrity)
+        if not celebrity:
+            backfill_followers(author_id)
+    return True
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author=post.author_id
+    ).values_list('user', flat=True)
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user, author):
+    """Добавляет в ленту пользователя посты автора, на которого он
+    подписался."""
+    if is_celebrity(author):
+        return
+    posts = Post.objects.filter(author=author).values_list('pk', 'pub_date')
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user.pk, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts.iterator()
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def prune(user, author):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    FeedItem.objects.filter(user=user, post__author=author).delete()
+
+
+def follow_feed(user):
+    """Посты авторов, на которых подписан пользователь.
+    Обычно это один диапазон индекса по FeedItem; посты знаменитостей
+    подмешиваются при чтении."""
+    celebrities = celebrity_authors(user)
+    if not celebrities:
+        return Post.objects.filter(feed_items__user=user).order_by(
+            '-feed_items__pub_date', '-feed_items__id'
+        )
+    return Post.objects.filter(
+        Q(pk__in=FeedItem.objects.filter(user=user).values('post'))
+        | Q(author__in=celebrities)
+    )
@@ -0,0 +1,38 @@
+from django.db import connection
+
+from .models import Follow
+from .utils import forget_followed_authors
+
+
+def follow(user, author):
+    """Подписывает user на author одним INSERT без сигналов модели.
+    Возвращает True, если подписки ещё не было."""
+    quote = connection.ops.quote_name
+    sql = (
+        f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+        f'{quote(Follow._meta.db_table)} '
+        f'({quote("user_id")}, {quote("author_id")}) VALUES (%s, %s)'
+        f' {connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, author.pk])
+        created = cursor.rowcount == 1
+    if created:
+        forget_followed_authors(user.pk)
+    return created
+
+
+def unfollow(user, author):
+    """Отписывает одним DELETE без сигналов модели. Возвращает True,
+    если подписка была."""
+    quote = connection.ops.quote_name
+    sql = (
+        f'DELETE FROM {quote(Follow._meta.db_table)} '
+        f'WHERE {quote("user_id")} = %s AND {quote("author_id")} = %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, author.pk])
+        deleted = cursor.rowcount == 1
+    if deleted:
+        forget_followed_authors(user.pk)
+    return deleted
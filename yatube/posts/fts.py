@@ -0,0 +1,103 @@
+import logging
+import re
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post
+
+logger = logging.getLogger(__name__)
+
+# Модели с полнотекстовым поиском по полю text в админке.
+FTS_MODELS = (Post, Comment)
+WORD_RE = re.compile(r'\w+')
+
+TRIGGERS_SQL = (
+    '''CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table}
+    BEGIN
+        INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table}
+    BEGIN
+        INSERT INTO {fts}({fts}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS {fts}_update
+    AFTER UPDATE OF text ON {table}
+    BEGIN
+        INSERT INTO {fts}({fts}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text);
+    END''',
+)
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def fts_available(model, using=DEFAULT_DB_ALIAS):
+    """Есть ли для модели таблица FTS5. На других СУБД - нет."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [fts_table(model)],
+        )
+        return cursor.fetchone() is not None
+
+
+def match_expression(search_term):
+    """Запрос FTS5: все слова поиска как префиксы, через AND."""
+    return ' '.join(
+        '"{}"*'.format(word.replace('"', '""'))
+        for word in WORD_RE.findall(search_term)
+    )
+
+
+def fts_filter(queryset, search_term):
+    """Оставляет в queryset строки, текст которых подходит под поиск.
+    Поиск без единого слова ничего не находит, как и LIKE по словам."""
+    expression = match_expression(search_term)
+    if not expression:
+        return queryset.none()
+    table = fts_table(queryset.model)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [expression]
+    ))
+
+
+def create_fts_tables(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Создаёт таблицы FTS5 и триггеры, которые держат их в синхронизации.
+    Вызывается после каждой миграции: SQLite пересоздаёт таблицу при
+    изменении схемы, и триггеры на ней теряются."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    tables = set(connection.introspection.table_names())
+    for model in FTS_MODELS:
+        table, fts = model._meta.db_table, fts_table(model)
+        if table not in tables:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master "
+                "WHERE type = 'trigger' AND tbl_name = %s AND name LIKE %s",
+                [table, f'{fts}_%'],
+            )
+            if fts in tables and cursor.fetchone()[0] == len(TRIGGERS_SQL):
+                continue
+            try:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5('
+                    f"text, content='{table}', content_rowid='id')"
+                )
+            except DatabaseError:
+                logger.warning('SQLite собран без FTS5, поиск без индекса')
+                return
+            for sql in TRIGGERS_SQL:
+                cursor.execute(sql.format(fts=fts, table=table))
+            # Пока триггеров не было, таблица могла измениться.
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
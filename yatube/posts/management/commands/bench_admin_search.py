@@ -0,0 +1,115 @@
+import random
+import statistics
+import time
+
+from django.contrib.admin import ModelAdmin
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.fts import fts_available
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+WORDS = (
+    'кот собака утро вечер город море книга музыка фильм дорога дом '
+    'работа друг погода лето зима весна осень кофе чай поезд лес река'
+).split()
+PAGE_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время поиска в админке через FTS5 и через LIKE. '
+        'С --rows сначала добавляет комментарии, по окончании они '
+        'откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=0,
+            help='Сколько комментариев добавить перед замером.',
+        )
+        parser.add_argument(
+            '--terms',
+            nargs='+',
+            default=['кот', 'осень дорога', 'редкоеслово'],
+            help='Поисковые запросы.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Число повторов каждого запроса.',
+        )
+
+    def seed(self, rows):
+        author, _ = User.objects.get_or_create(username='bench_admin_search')
+        post = Post.objects.create(author=author, text='Пост для замера')
+        rng = random.Random(0)
+        batch_size = 10000
+        for start in range(0, rows, batch_size):
+            Comment.objects.bulk_create(
+                Comment(
+                    post=post,
+                    author=author,
+                    text=' '.join(rng.choices(WORDS, k=12)),
+                )
+                for _ in range(min(batch_size, rows - start))
+            )
+        Comment.objects.filter(pk=Comment.objects.latest('pk').pk).update(
+            text='редкоеслово')
+
+    def measure(self, model_admin, term, repeat):
+        """Как список объектов в админке: число результатов
+        и первая страница."""
+        queryset = model_admin.model.objects.all()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results, _ = model_admin.get_search_results(None, queryset, term)
+            results.count()
+            list(results.order_by('-pk')[:PAGE_SIZE])
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        if not fts_available(Comment):
+            raise CommandError('Нет таблицы FTS5, нужен SQLite с FTS5.')
+        with transaction.atomic():
+            if options['rows']:
+                start = time.perf_counter()
+                self.seed(options['rows'])
+                self.stdout.write(
+                    f'Добавлено {options["rows"]} комментариев '
+                    f'за {time.perf_counter() - start:.1f} с'
+                )
+            self.stdout.write(
+                f'{"модель":<8} {"запрос":<16} {"LIKE, мс":>10} '
+                f'{"FTS5, мс":>10}'
+            )
+            for model in (Post, Comment):
+                model_admin = site._registry[model]
+                for term in options['terms']:
+                    fts = self.measure(model_admin, term, options['repeat'])
+                    # Обычный поиск ModelAdmin, в обход FTSSearchMixin.
+                    scan = self.measure(
+                        _ScanAdmin(model, site, model_admin),
+                        term,
+                        options['repeat'],
+                    )
+                    self.stdout.write(
+                        f'{model.__name__:<8} {term:<16} '
+                        f'{scan:>10.2f} {fts:>10.2f}'
+                    )
+            transaction.set_rollback(True)
+
+
+class _ScanAdmin(ModelAdmin):
+    def __init__(self, model, admin_site, model_admin):
+        super().__init__(model, admin_site)
+        self.search_fields = model_admin.search_fields
@@ -0,0 +1,194 @@
+import asyncio
+import io
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db.models import Count
+from django.urls import reverse
+
+from core.asgi import ASGIHandler
+from posts.models import Group, Post
+
+from .bench_views import percentile
+
+VIEWS = ('index', 'group_list', 'profile', 'post_detail')
+
+
+def receiver():
+    """receive() одного запроса с пустым телом."""
+    messages = [{'type': 'http.request', 'body': b''}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # После тела запроса клиент не закрывает соединение.
+        await asyncio.Event().wait()
+
+    return receive
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI и ASGI (yatube.asgi) на view чтения при '
+        'одновременных медленных клиентах. Оба пути получают одинаковое '
+        'число потоков: в WSGI поток занят и пока клиент читает ответ, '
+        'в ASGI ответ отдаёт цикл событий, а поток уже свободен.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--views',
+            nargs='+',
+            default=list(VIEWS),
+            choices=VIEWS,
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=50,
+            help='Число одновременных клиентов.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=20,
+            help='Число запросов от каждого клиента к каждой view.',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.ASGI_THREADS,
+            help='Число потоков: воркеров WSGI и пула ASGI.',
+        )
+        parser.add_argument(
+            '--client-delay',
+            type=float,
+            default=50,
+            help='Сколько мс клиент читает ответ.',
+        )
+
+    def get_urls(self):
+        post = Post.objects.select_related('author').annotate(
+            comments_total=Count('comments')).order_by(
+            '-comments_total').first()
+        group = Group.objects.annotate(
+            posts_total=Count('post')).order_by('-posts_total').first()
+        if post is None or group is None:
+            raise CommandError('Нужны посты и группы: запустите seed_data.')
+        return {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': post.author.username}),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}),
+        }
+
+    def scope(self, url):
+        return {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url,
+            'query_string': b'',
+            'headers': [(b'host', b'testserver')],
+            'server': ('testserver', 80),
+            # Адрес вне INTERNAL_IPS, чтобы не подключался debug_toolbar.
+            'client': ('10.0.0.1', 40000),
+        }
+
+    def run_wsgi(self, wsgi, asgi, url, clients, requests, threads, delay):
+        """Клиенты в потоках, семафор - воркеры WSGI-сервера."""
+        workers = threading.BoundedSemaphore(threads)
+        timings = []
+        lock = threading.Lock()
+
+        def start_response(status, headers, exc_info=None):
+            if not status.startswith('200'):
+                raise CommandError(f'{url}: ответ {status}')
+
+        def client():
+            for _ in range(requests):
+                start = time.perf_counter()
+                with workers:
+                    environ = asgi.get_environ(self.scope(url), io.BytesIO())
+                    response = wsgi(environ, start_response)
+                    try:
+                        for _ in response:
+                            pass
+                    finally:
+                        response.close()
+                    time.sleep(delay)
+                with lock:
+                    timings.append((time.perf_counter() - start) * 1000)
+
+        client_threads = [
+            threading.Thread(target=client) for _ in range(clients)]
+        started = time.perf_counter()
+        for thread in client_threads:
+            thread.start()
+        for thread in client_threads:
+            thread.join()
+        return timings, time.perf_counter() - started
+
+    def run_asgi(self, asgi, url, clients, requests, delay):
+        """Клиенты - задачи одного цикла событий."""
+        timings = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                if message['status'] != 200:
+                    raise CommandError(f'{url}: ответ {message["status"]}')
+            elif not message.get('more_body'):
+                await asyncio.sleep(delay)
+
+        async def client():
+            for _ in range(requests):
+                start = time.perf_counter()
+                await asgi(self.scope(url), receiver(), send)
+                timings.append((time.perf_counter() - start) * 1000)
+
+        async def main():
+            await asyncio.gather(*(client() for _ in range(clients)))
+
+        started = time.perf_counter()
+        asyncio.run(main())
+        return timings, time.perf_counter() - started
+
+    def report(self, name, mode, timings, total):
+        timings.sort()
+        self.stdout.write(
+            f'{name:<12} {mode:<5} {statistics.median(timings):>9.2f} '
+            f'{percentile(timings, 95):>9.2f} '
+            f'{percentile(timings, 99):>9.2f} {len(timings) / total:>8.1f}'
+        )
+
+    def handle(self, *args, **options):
+        urls = self.get_urls()
+        wsgi = get_wsgi_application()
+        asgi = ASGIHandler(wsgi, options['threads'])
+        delay = options['client_delay'] / 1000
+        self.stdout.write(
+            f'{"view":<12} {"путь":<5} {"p50, мс":>9} {"p95, мс":>9} '
+            f'{"p99, мс":>9} {"RPS":>8}'
+        )
+        try:
+            for name in options['views']:
+                timings, total = self.run_wsgi(
+                    wsgi, asgi, urls[name], options['clients'],
+                    options['requests'], options['threads'], delay,
+                )
+                self.report(name, 'wsgi', timings, total)
+                timings, total = self.run_asgi(
+                    asgi, urls[name], options['clients'],
+                    options['requests'], delay,
+                )
+                self.report(name, 'asgi', timings, total)
+        finally:
+            asgi.executor.shutdown()
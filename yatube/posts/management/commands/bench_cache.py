@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время ответа лент из кэша для разных бэкендов. '
+        'Работает на данных текущей базы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends',
+            nargs='+',
+            default=['locmem', 'file', 'db'],
+            choices=sorted(settings.CACHE_BACKENDS),
+            help='Бэкенды из settings.CACHE_BACKENDS.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Число запросов к каждой странице.',
+        )
+
+    def get_urls(self):
+        post = Post.objects.select_related('group', 'author').filter(
+            group__isnull=False).first()
+        if post is None:
+            raise CommandError('Нужен хотя бы один пост с группой.')
+        return {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': post.group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': post.author.username}),
+        }
+
+    def handle(self, *args, **options):
+        urls = self.get_urls()
+        # Адрес вне INTERNAL_IPS, чтобы не подключался debug_toolbar.
+        client = Client(REMOTE_ADDR='10.0.0.1')
+        self.stdout.write(
+            f'{"бэкенд":<8} {"страница":<12} {"p50, мс":>9} '
+            f'{"p95, мс":>9} {"среднее, мс":>12}'
+        )
+        for backend in options['backends']:
+            caches = {'default': settings.CACHE_BACKENDS[backend]}
+            with override_settings(CACHES=caches):
+                try:
+                    if backend == 'db':
+                        call_command('createcachetable', verbosity=0)
+                    cache.clear()
+                except (ImportError, InvalidCacheBackendError) as error:
+                    self.stderr.write(f'{backend}: пропущен ({error})')
+                    continue
+                for name, url in urls.items():
+                    client.get(url)
+                    timings = []
+                    for _ in range(options['requests']):
+                        start = time.perf_counter()
+                        client.get(url)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    timings.sort()
+                    p95 = timings[int(len(timings) * 0.95) - 1]
+                    self.stdout.write(
+                        f'{backend:<8} {name:<12} '
+                        f'{statistics.median(timings):>9.2f} {p95:>9.2f} '
+                        f'{statistics.mean(timings):>12.2f}'
+                    )
@@ -0,0 +1,219 @@
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.metrics import QueryCounter
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+VIEWS = (
+    'index', 'group_list', 'profile', 'post_detail', 'follow_index',
+    'post_create', 'add_comment',
+)
+# Метрики, рост которых считается регрессией.
+LOWER_IS_BETTER = ('p50', 'p95', 'p99', 'queries', 'bytes')
+
+
+def percentile(timings, percent):
+    """Перцентиль по отсортированному списку (метод ближайшего ранга)."""
+    index = max(round(len(timings) * percent / 100) - 1, 0)
+    return timings[min(index, len(timings) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, пропускную способность, число SQL-запросов '
+        'и размер ответа view постов через WSGI-приложение на данных '
+        'текущей базы (см. seed_data). Записи, созданные во время замера, '
+        'откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--views',
+            nargs='+',
+            default=list(VIEWS),
+            choices=VIEWS,
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Число запросов к каждой view.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл, в который сохранить результаты в JSON.',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON прошлого запуска, с которым сравнить результаты.',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=20,
+            help='Ухудшение в процентах, которое считается регрессией.',
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Завершиться с ошибкой, если есть регрессии.',
+        )
+
+    def get_targets(self):
+        post = Post.objects.annotate(
+            comments_total=Count('comments')).order_by(
+            '-comments_total').select_related('author').first()
+        group = Group.objects.annotate(
+            posts_total=Count('post')).order_by('-posts_total').first()
+        follower = Follow.objects.values('user').annotate(
+            total=Count('pk')).order_by('-total').first()
+        if post is None or group is None or follower is None:
+            raise CommandError(
+                'Нужны посты, группы и подписки: запустите seed_data.')
+        return post, group, follower['user']
+
+    def get_requests(self, post, group):
+        """Запросы для каждой view: (метод, адрес, данные)."""
+        return {
+            'index': ('get', reverse('posts:index'), None),
+            'group_list': (
+                'get',
+                reverse('posts:group_list', kwargs={'slug': group.slug}),
+                None,
+            ),
+            'profile': (
+                'get',
+                reverse(
+                    'posts:profile',
+                    kwargs={'username': post.author.username},
+                ),
+                None,
+            ),
+            'post_detail': (
+                'get',
+                reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+                None,
+            ),
+            'follow_index': ('get', reverse('posts:follow_index'), None),
+            'post_create': (
+                'post',
+                reverse('posts:post_create'),
+                {'text': 'Пост из замера производительности'},
+            ),
+            'add_comment': (
+                'post',
+                reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+                {'text': 'Комментарий из замера производительности'},
+            ),
+        }
+
+    def measure(self, client, method, url, data, count):
+        send = getattr(client, method)
+        # Первый запрос прогревает кэш, второй показывает число
+        # запросов к базе в установившемся режиме.
+        send(url, data)
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = send(url, data)
+        if response.status_code >= 400:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        timings = []
+        started = time.perf_counter()
+        for _ in range(count):
+            start = time.perf_counter()
+            send(url, data)
+            timings.append((time.perf_counter() - start) * 1000)
+        total = time.perf_counter() - started
+        timings.sort()
+        return {
+            'status': response.status_code,
+            'p50': round(statistics.median(timings), 3),
+            'p95': round(percentile(timings, 95), 3),
+            'p99': round(percentile(timings, 99), 3),
+            'rps': round(count / total, 1),
+            'queries': queries.count,
+            'bytes': len(response.content),
+        }
+
+    def handle(self, *args, **options):
+        post, group, user_id = self.get_targets()
+        requests = self.get_requests(post, group)
+        results = {
+            'meta': {
+                'date': timezone.now().isoformat(),
+                'requests': options['requests'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'views': {},
+        }
+        # Адрес вне INTERNAL_IPS, чтобы не подключался debug_toolbar.
+        client = Client(REMOTE_ADDR='10.0.0.1')
+        self.stdout.write(
+            f'{"view":<14} {"p50, мс":>9} {"p95, мс":>9} {"p99, мс":>9} '
+            f'{"RPS":>8} {"SQL":>5} {"байт":>8}'
+        )
+        with transaction.atomic():
+            # Самый активный подписчик: у него самая длинная лента.
+            client.force_login(User.objects.get(pk=user_id))
+            for name in options['views']:
+                method, url, data = requests[name]
+                result = self.measure(
+                    client, method, url, data, options['requests'])
+                results['views'][name] = result
+                self.stdout.write(
+                    f'{name:<14} {result["p50"]:>9.2f} {result["p95"]:>9.2f} '
+                    f'{result["p99"]:>9.2f} {result["rps"]:>8.1f} '
+                    f'{result["queries"]:>5} {result["bytes"]:>8}'
+                )
+            transaction.set_rollback(True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            regressions = self.compare(
+                results, options['compare'], options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'Регрессий: {regressions}')
+
+    def compare(self, results, path, threshold):
+        """Печатает изменения относительно прошлого запуска
+        и возвращает число регрессий."""
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['views']
+        regressions = 0
+        for name, result in results['views'].items():
+            if name not in baseline:
+                continue
+            for metric in (*LOWER_IS_BETTER, 'rps'):
+                before, after = baseline[name][metric], result[metric]
+                if not before:
+                    continue
+                change = (after - before) / before * 100
+                worse = -change if metric == 'rps' else change
+                if worse > threshold:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'{name} {metric}: {before} -> {after} '
+                        f'({change:+.1f}%)'
+                    ))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+        return regressions
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша страниц лент.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода.',
+        )
+
+    def handle(self, *args, **options):
+        for kind, stats in cache_stats().items():
+            total = stats['hits'] + stats['misses']
+            ratio = stats['hits'] / total if total else 0
+            self.stdout.write(
+                f'{kind}: попаданий {stats["hits"]}, '
+                f'промахов {stats["misses"]}, доля попаданий {ratio:.0%}'
+            )
+        if options['reset']:
+            reset_cache_stats()
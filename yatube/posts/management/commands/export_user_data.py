@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.export import FORMATS, export_stream
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки пользователя в NDJSON '
+        'или CSV. Данные читаются и пишутся потоком, без загрузки '
+        'в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=sorted(FORMATS), default='ndjson')
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжать выгрузку gzip.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для выгрузки; по умолчанию - стандартный вывод.',
+        )
+        parser.add_argument(
+            '--since',
+            help=(
+                'Только посты и комментарии, изменённые позже этого '
+                'момента (ISO 8601).'
+            ),
+        )
+
+    def parse_since(self, value):
+        since = parse_datetime(value)
+        if since is None:
+            raise CommandError(f'Некорректная дата: {value}')
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден.')
+        since = None
+        if options['since']:
+            since = self.parse_since(options['since'])
+        chunks = export_stream(
+            user, options['format'], options['gzip'], since)
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            self.write_stdout(chunks, options['gzip'])
+
+    def write_stdout(self, chunks, compressed):
+        # Сжатые байты пишутся мимо self.stdout, который ждёт строки.
+        output = getattr(self.stdout, 'buffer', None)
+        if output is None:
+            if compressed:
+                raise CommandError(
+                    'Сжатую выгрузку укажите писать в --output.')
+            for chunk in chunks:
+                # Куски кончаются на границе строки, UTF-8 не рвётся.
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс по постам и группам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help=(
+                'Перестроить только посты, изменённые позже этого момента '
+                '(ISO 8601, например 2024-05-01T12:00:00+00:00).'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(
+                    f'Некорректная дата: {options["since"]}')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        with transaction.atomic():
+            terms = rebuild_index(since)
+        self.stdout.write(self.style.SUCCESS(f'Записей в индексе: {terms}'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts.stats import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписчиков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать число расхождений, ничего не исправляя.',
+        )
+
+    def handle(self, *args, **options):
+        fix = not options['dry_run']
+        drift = recount(fix=fix)
+        if not drift:
+            self.stdout.write('Расхождений нет.')
+        elif fix:
+            self.stdout.write(
+                self.style.SUCCESS(f'Исправлено расхождений: {drift}')
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(f'Найдено расхождений: {drift}')
+            )
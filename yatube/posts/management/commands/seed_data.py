@@ -0,0 +1,299 @@
+import io
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from posts.models import (
+    AuthorStats, Comment, FeedItem, Follow, Group, Post
+)
+from posts.search import rebuild_index
+from posts.stats import recount
+from posts.utils import batched
+
+User = get_user_model()
+
+WORDS = (
+    'день кот город утро вечер море книга музыка фильм дорога дом работа '
+    'друг погода лето зима весна осень кофе чай поезд лес река гора небо '
+    'солнце дождь снег ветер окно улица парк сад цветок дерево птица '
+    'собака школа урок код проект идея вопрос ответ история новость '
+    'фото картина песня концерт театр музей выставка путешествие отпуск '
+    'семья мама папа брат сестра дети праздник подарок ужин завтрак обед '
+    'хлеб суп пирог яблоко спорт бег футбол мяч игра победа команда '
+    'новый старый большой маленький красивый интересный быстрый тихий '
+    'хороший плохой первый последний читать писать смотреть слушать '
+    'думать знать любить гулять ехать идти работать отдыхать играть'
+).split()
+IMAGE_COUNT = 20
+
+
+def power_law_weights(count, exponent):
+    """Накопленные веса закона Ципфа: k-й по популярности элемент
+    встречается в 1 / k ** exponent раз реже первого."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+@contextmanager
+def keep_pub_date(*models):
+    """Отключает auto_now_add и auto_now, чтобы сохранить
+    сгенерированные даты создания и изменения."""
+    fields = [
+        model._meta.get_field(name)
+        for model in models
+        for name in ('pub_date', 'updated_at')
+    ]
+    saved = [(field.auto_now_add, field.auto_now) for field in fields]
+    for field in fields:
+        field.auto_now_add = field.auto_now = False
+    try:
+        yield
+    finally:
+        for field, (auto_now_add, auto_now) in zip(fields, saved):
+            field.auto_now_add, field.auto_now = auto_now_add, auto_now
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу пользователями, группами, постами, комментариями '
+        'и подписками с распределениями по закону Ципфа: немногие авторы '
+        'пишут и собирают подписчиков больше всех.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='Среднее число подписок на пользователя.',
+        )
+        parser.add_argument(
+            '--images',
+            type=float,
+            default=0.2,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько последних дней распределить даты.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-search-index',
+            action='store_true',
+            help='Не перестраивать поисковый индекс.',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 and options['follows']:
+            raise CommandError('Для подписок нужны хотя бы два пользователя.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days'])
+        self.word_weights = power_law_weights(len(WORDS), 1.0)
+        started = time.perf_counter()
+        with transaction.atomic(), keep_pub_date(Post, Comment):
+            users = self.step('пользователи', self.create_users,
+                              options['users'])
+            groups = self.step('группы', self.create_groups,
+                               options['groups'])
+            self.step('подписки', self.create_follows, users,
+                      options['follows'])
+            last_post_pk = self.last_pk(Post)
+            posts = self.step('посты', self.create_posts, users, groups,
+                              options['posts'], options['images'])
+            self.step('комментарии', self.create_comments, users, posts,
+                      options['comments'])
+            self.step('счётчики', recount)
+            self.step('ленты', self.create_feed_items, last_post_pk)
+            if not options['no_search_index']:
+                self.step('поисковый индекс', rebuild_index)
+        # Страницы в кэше не знают о новых данных.
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def step(self, name, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.stdout.write(f'{name}: {time.perf_counter() - started:.1f} с')
+        return result
+
+    def bulk_create(self, model, objs):
+        for batch in batched(objs, self.batch_size):
+            model.objects.bulk_create(batch)
+
+    def new_pks(self, model, last_pk, *fields):
+        # SQLite не возвращает id из bulk_create, читаем их обратно.
+        return list(
+            model.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', *fields)
+        )
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def random_date(self, start=None):
+        start = start or self.now - self.period
+        return start + (self.now - start) * self.rng.random()
+
+    def random_text(self, min_words, max_words):
+        words = self.rng.choices(
+            WORDS,
+            cum_weights=self.word_weights,
+            k=self.rng.randint(min_words, max_words),
+        )
+        return ' '.join(words).capitalize() + '.'
+
+    def create_users(self, count):
+        last_pk = self.last_pk(User)
+        password = make_password(None)
+        self.bulk_create(User, (
+            User(
+                username=f'seed{last_pk + number}',
+                password=password,
+                date_joined=self.random_date(),
+            )
+            for number in range(1, count + 1)
+        ))
+        user_ids = [pk for pk, in self.new_pks(User, last_pk)]
+        # Популярность не должна совпадать с порядком создания.
+        self.rng.shuffle(user_ids)
+        return user_ids
+
+    def create_groups(self, count):
+        last_pk = self.last_pk(Group)
+        self.bulk_create(Group, (
+            Group(
+                title=self.random_text(1, 3).rstrip('.'),
+                slug=f'seed-{last_pk + number}',
+                description=self.random_text(5, 30),
+            )
+            for number in range(1, count + 1)
+        ))
+        return [pk for pk, in self.new_pks(Group, last_pk)]
+
+    def create_follows(self, user_ids, average):
+        """Число подписок пользователя и популярность авторов
+        распределены по степенному закону."""
+        if not average:
+            return
+        weights = power_law_weights(len(user_ids), 1.0)
+        follows = []
+        for user_id in user_ids:
+            count = int(self.rng.paretovariate(1.5) * average / 3)
+            # Повторы отбрасываются, поэтому у самых активных
+            # пользователей подписок может выйти меньше count.
+            authors = set(self.rng.choices(
+                user_ids, cum_weights=weights, k=count * 2))
+            authors.discard(user_id)
+            for author_id in itertools.islice(authors, count):
+                follows.append(Follow(user_id=user_id, author_id=author_id))
+        self.bulk_create(Follow, follows)
+
+    def create_images(self):
+        names = []
+        for number in range(IMAGE_COUNT):
+            image = Image.new('RGB', (960, 540), (
+                self.rng.randrange(256),
+                self.rng.randrange(256),
+                self.rng.randrange(256),
+            ))
+            content = io.BytesIO()
+            image.save(content, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/seed_{number}.jpg', ContentFile(content.getvalue())
+            ))
+        return names
+
+    def create_posts(self, user_ids, group_ids, count, images_share):
+        images = self.create_images() if images_share else []
+        author_weights = power_law_weights(len(user_ids), 1.0)
+        group_weights = power_law_weights(len(group_ids), 1.0)
+        last_pk = self.last_pk(Post)
+
+        def posts():
+            for _ in range(count):
+                group_id = None
+                if group_ids and self.rng.random() < 0.7:
+                    group_id = self.rng.choices(
+                        group_ids, cum_weights=group_weights)[0]
+                image = ''
+                if images and self.rng.random() < images_share:
+                    image = self.rng.choice(images)
+                pub_date = self.random_date()
+                yield Post(
+                    text=self.random_text(5, 60),
+                    author_id=self.rng.choices(
+                        user_ids, cum_weights=author_weights)[0],
+                    group_id=group_id,
+                    image=image,
+                    pub_date=pub_date,
+                    updated_at=pub_date,
+                )
+
+        self.bulk_create(Post, posts())
+        return self.new_pks(Post, last_pk, 'pub_date', 'author')
+
+    def create_comments(self, user_ids, posts, count):
+        if not posts:
+            return
+        # Обсуждают в основном немногие популярные посты.
+        ranked = self.rng.sample(posts, len(posts))
+        weights = power_law_weights(len(ranked), 1.0)
+
+        def comments():
+            for post_id, post_date, _ in self.rng.choices(
+                    ranked, cum_weights=weights, k=count):
+                pub_date = self.random_date(post_date)
+                yield Comment(
+                    post_id=post_id,
+                    author_id=self.rng.choice(user_ids),
+                    text=self.random_text(1, 20),
+                    pub_date=pub_date,
+                    updated_at=pub_date,
+                )
+
+        self.bulk_create(Comment, comments())
+
+    def create_feed_items(self, last_post_pk):
+        """Раскладывает новые посты по лентам, как fan_out_post, но одним
+        INSERT ... SELECT: лент получается на порядки больше, чем постов."""
+        qn = connection.ops.quote_name
+        feed = qn(FeedItem._meta.db_table)
+        post = qn(Post._meta.db_table)
+        follow = qn(Follow._meta.db_table)
+        stats = qn(AuthorStats._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {feed} (user_id, post_id, pub_date) '
+                f'SELECT {follow}.user_id, {post}.id, {post}.pub_date '
+                f'FROM {post} INNER JOIN {follow} '
+                f'ON {follow}.author_id = {post}.author_id '
+                f'WHERE {post}.id > %s AND {post}.author_id NOT IN ('
+                f'SELECT user_id FROM {stats} WHERE feed_pulled = %s)',
+                [last_post_pk, True],
+            )
@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    # Одним INSERT ... SELECT, как seed_data: лент на порядки больше,
+    # чем подписок, и строить их по подписке в Python долго.
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    FeedItem = apps.get_model('posts', 'FeedItem')
+    connection = schema_editor.connection
+    qn = connection.ops.quote_name
+    feed = qn(FeedItem._meta.db_table)
+    post = qn(Post._meta.db_table)
+    follow = qn(Follow._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {feed} (user_id, post_id, pub_date) '
+            f'SELECT {follow}.user_id, {post}.id, {post}.pub_date '
+            f'FROM {post} INNER JOIN {follow} '
+            f'ON {follow}.author_id = {post}.author_id '
+            f'WHERE {post}.author_id NOT IN ('
+            f'SELECT author_id FROM {follow} GROUP BY author_id '
+            f'HAVING COUNT(*) > %s)',
+            [settings.FEED_FANOUT_LIMIT],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0018_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-pub_date', '-id'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='feed_item_unique'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
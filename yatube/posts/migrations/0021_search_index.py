@@ -0,0 +1,152 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:30
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия разбора на термы из posts.search на момент миграции: миграция
+# не должна зависеть от того, как этот модуль изменится потом.
+TERM_MAX_LENGTH = 64
+# Вес термов группы: совпадение в названии важнее, чем в описании.
+GROUP_TITLE_WEIGHT = 3
+GROUP_DESCRIPTION_WEIGHT = 1
+
+WORD_RE = re.compile(r'\w+')
+STOP_WORDS = frozenset(
+    'а без более бы был была были было быть в вам вас весь во вот все '
+    'всего всех вы где да даже для до его ее если есть еще же за здесь '
+    'и из или им их к как ко когда кто ли либо между меня мне может мы '
+    'на над надо наш не него нее нет ни них но ну о об однако он она '
+    'они оно от очень по под при с со так также такой там те тем то '
+    'того тоже той только том ты у уже хотя чего чей чем что чтобы чье '
+    'чья эта эти это я'.split()
+)
+
+# Стеммер Портера для русского языка.
+RV_RE = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND_RE = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE_RE = re.compile(r'(с[яь])$')
+ADJECTIVE_RE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE_RE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB_RE = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN_RE = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL_RE = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_SUFFIX_RE = re.compile(r'ость?$')
+SUPERLATIVE_RE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Основа русского слова; слова на латинице только
+    приводятся к нижнему регистру."""
+    word = word.lower().replace('ё', 'е')
+    match = RV_RE.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+    result = PERFECTIVE_GERUND_RE.sub('', rv, 1)
+    if result == rv:
+        rv = REFLEXIVE_RE.sub('', rv, 1)
+        result = ADJECTIVE_RE.sub('', rv, 1)
+        if result != rv:
+            rv = PARTICIPLE_RE.sub('', result, 1)
+        else:
+            result = VERB_RE.sub('', rv, 1)
+            rv = NOUN_RE.sub('', rv, 1) if result == rv else result
+    else:
+        rv = result
+    rv = re.sub('и$', '', rv, 1)
+    if DERIVATIONAL_RE.match(rv):
+        rv = DERIVATIONAL_SUFFIX_RE.sub('', rv, 1)
+    result = re.sub('ь$', '', rv, 1)
+    if result == rv:
+        rv = SUPERLATIVE_RE.sub('', rv, 1)
+        rv = re.sub('нн$', 'н', rv, 1)
+    else:
+        rv = result
+    return start + rv
+
+
+def text_terms(text):
+    """Термы текста с числом вхождений."""
+    return Counter(
+        stem(word)[:TERM_MAX_LENGTH]
+        for word in WORD_RE.findall(text.lower())
+        if word not in STOP_WORDS
+    )
+
+
+def group_terms(group):
+    terms = Counter()
+    for term, count in text_terms(group.title).items():
+        terms[term] += count * GROUP_TITLE_WEIGHT
+    for term, count in text_terms(group.description).items():
+        terms[term] += count * GROUP_DESCRIPTION_WEIGHT
+    return terms
+
+
+def fill_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    PostTerm = apps.get_model('posts', 'PostTerm')
+    GroupTerm = apps.get_model('posts', 'GroupTerm')
+    PostTerm.objects.bulk_create(
+        PostTerm(term=term, post_id=pk, weight=weight)
+        for pk, text in Post.objects.values_list('pk', 'text').iterator()
+        for term, weight in text_terms(text).items()
+    )
+    GroupTerm.objects.bulk_create(
+        GroupTerm(term=term, group_id=group.pk, weight=weight)
+        for group in Group.objects.iterator()
+        for term, weight in group_terms(group).items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_author_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Group')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='postterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='post_term_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupterm',
+            constraint=models.UniqueConstraint(fields=('term', 'group'), name='group_term_unique'),
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
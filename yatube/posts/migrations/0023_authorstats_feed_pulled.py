@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_feed_pulled(apps, schema_editor):
+    # До флага режим определялся числом подписчиков при чтении.
+    apps.get_model('posts', 'AuthorStats').objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, verbose_name='Подмешивается в ленты при чтении'),
+        ),
+        migrations.RunPython(fill_feed_pulled, migrations.RunPython.noop),
+    ]
@@ -10,6 +10,22 @@ User = get_user_model()
 class Post(CreatedModel):
     class Meta:
         ordering = ['-pub_date']
+        # Индексы повторяют формы запросов лент: сортировка по дате
+        # (с id для keyset-пагинации), фильтр по группе и по автору.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+        ]
     text = models.TextField()
     author = models.ForeignKey(
         User,
@@ -27,6 +43,11 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True,
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self):
         return self.text[:15]
@@ -54,6 +75,14 @@ class Comment(CreatedModel):
     )
     text = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'],
+                name='comment_post_pub_date_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -75,3 +104,103 @@ class Follow(models.Model):
                 name='follow_unique'
             )
         ]
+        # Уникальное ограничение покрывает выборку по user,
+        # обратный индекс нужен для проверок подписки по автору.
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class FeedItem(models.Model):
+    """Материализованная лента подписок: строка на пару
+    (подписчик, пост), заполняется при публикации поста."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+    )
+    # Копия Post.pub_date, чтобы лента читалась одним диапазоном индекса.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='feed_item_unique'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-id'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора. Обновляются сигналами,
+    расхождения исправляет команда recount_stats."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+    )
+    # Посты автора не раскладываются по лентам, а подмешиваются при
+    # чтении. Меняется только в feed.update_delivery.
+    feed_pulled = models.BooleanField(
+        'Подмешивается в ленты при чтении',
+        default=False,
+    )
+
+
+class PostTerm(models.Model):
+    """Обратный индекс поиска: основа слова из текста поста
+    и число её вхождений."""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+    )
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'],
+                name='post_term_unique'
+            )
+        ]
+
+
+class GroupTerm(models.Model):
+    """Обратный индекс поиска по названию и описанию группы."""
+    term = models.CharField(max_length=64)
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+    )
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'group'],
+                name='group_term_unique'
+            )
+        ]
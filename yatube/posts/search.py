@@ -0,0 +1,208 @@
+import re
+from collections import Counter
+
+from django.db.models import IntegerField
+from django.db.models.expressions import RawSQL
+from django.db.models.sql.constants import INNER
+
+from .models import Group, GroupTerm, Post, PostTerm
+from .utils import batched
+
+# Сколько записей индекса держать в памяти при полной перестройке.
+CHUNK_SIZE = 10000
+TERM_MAX_LENGTH = 64
+# Вес термов группы: совпадение в названии важнее, чем в описании.
+GROUP_TITLE_WEIGHT = 3
+GROUP_DESCRIPTION_WEIGHT = 1
+
+WORD_RE = re.compile(r'\w+')
+STOP_WORDS = frozenset(
+    'а без более бы был была были было быть в вам вас весь во вот все '
+    'всего всех вы где да даже для до его ее если есть еще же за здесь '
+    'и из или им их к как ко когда кто ли либо между меня мне может мы '
+    'на над надо наш не него нее нет ни них но ну о об однако он она '
+    'они оно от очень по под при с со так также такой там те тем то '
+    'того тоже той только том ты у уже хотя чего чей чем что чтобы чье '
+    'чья эта эти это я'.split()
+)
+
+# Стеммер Портера для русского языка.
+RV_RE = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND_RE = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE_RE = re.compile(r'(с[яь])$')
+ADJECTIVE_RE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE_RE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB_RE = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN_RE = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL_RE = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_SUFFIX_RE = re.compile(r'ость?$')
+SUPERLATIVE_RE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Основа русского слова; слова на латинице только
+    приводятся к нижнему регистру."""
+    word = word.lower().replace('ё', 'е')
+    match = RV_RE.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+    result = PERFECTIVE_GERUND_RE.sub('', rv, 1)
+    if result == rv:
+        rv = REFLEXIVE_RE.sub('', rv, 1)
+        result = ADJECTIVE_RE.sub('', rv, 1)
+        if result != rv:
+            rv = PARTICIPLE_RE.sub('', result, 1)
+        else:
+            result = VERB_RE.sub('', rv, 1)
+            rv = NOUN_RE.sub('', rv, 1) if result == rv else result
+    else:
+        rv = result
+    rv = re.sub('и$', '', rv, 1)
+    if DERIVATIONAL_RE.match(rv):
+        rv = DERIVATIONAL_SUFFIX_RE.sub('', rv, 1)
+    result = re.sub('ь$', '', rv, 1)
+    if result == rv:
+        rv = SUPERLATIVE_RE.sub('', rv, 1)
+        rv = re.sub('нн$', 'н', rv, 1)
+    else:
+        rv = result
+    return start + rv
+
+
+def text_terms(text):
+    """Термы текста с числом вхождений."""
+    return Counter(
+        stem(word)[:TERM_MAX_LENGTH]
+        for word in WORD_RE.findall(text.lower())
+        if word not in STOP_WORDS
+    )
+
+
+def group_terms(group):
+    terms = Counter()
+    for term, count in text_terms(group.title).items():
+        terms[term] += count * GROUP_TITLE_WEIGHT
+    for term, count in text_terms(group.description).items():
+        terms[term] += count * GROUP_DESCRIPTION_WEIGHT
+    return terms
+
+
+def index_post(post):
+    """Перестраивает записи индекса для поста."""
+    PostTerm.objects.filter(post=post).delete()
+    PostTerm.objects.bulk_create(
+        PostTerm(term=term, post_id=post.pk, weight=weight)
+        for term, weight in text_terms(post.text).items()
+    )
+
+
+def index_group(group):
+    """Перестраивает записи индекса для группы."""
+    GroupTerm.objects.filter(group=group).delete()
+    GroupTerm.objects.bulk_create(
+        GroupTerm(term=term, group_id=group.pk, weight=weight)
+        for term, weight in group_terms(group).items()
+    )
+
+
+def rebuild_index(since=None):
+    """Строит индекс заново по всем постам и группам. С since
+    перестраивает только посты, изменённые позже этого момента."""
+    posts = Post.objects.all()
+    if since is None:
+        PostTerm.objects.all().delete()
+    else:
+        posts = posts.changed_since(since)
+        PostTerm.objects.filter(post__in=posts.values('pk')).delete()
+    GroupTerm.objects.all().delete()
+    post_terms = (
+        PostTerm(term=term, post_id=pk, weight=weight)
+        for pk, text in posts.values_list('pk', 'text').iterator()
+        for term, weight in text_terms(text).items()
+    )
+    for batch in batched(post_terms, CHUNK_SIZE):
+        PostTerm.objects.bulk_create(batch)
+    GroupTerm.objects.bulk_create(
+        GroupTerm(term=term, group_id=group.pk, weight=weight)
+        for group in Group.objects.iterator()
+        for term, weight in group_terms(group).items()
+    )
+    return PostTerm.objects.count() + GroupTerm.objects.count()
+
+
+class RankJoin:
+    """INNER JOIN постов с подзапросом, который объединяет через UNION ALL
+    совпавшие термы поста и его группы и складывает их веса по посту.
+    Подзапрос строится при каждом поиске, в базе ничего не хранится."""
+    table_name = 'search_rank'
+    join_type = INNER
+    nullable = False
+    filtered_relation = None
+
+    def __init__(self, terms, parent_alias, table_alias=None):
+        self.terms = terms
+        self.parent_alias = parent_alias
+        self.table_alias = table_alias
+
+    def as_sql(self, compiler, connection):
+        qn = connection.ops.quote_name
+        post = qn(Post._meta.db_table)
+        post_term = qn(PostTerm._meta.db_table)
+        group_term = qn(GroupTerm._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(self.terms))
+        sql = (
+            f'{self.join_type} ('
+            f'SELECT matches.post_id, SUM(matches.weight) AS rank FROM ('
+            f'SELECT post_id, weight FROM {post_term} '
+            f'WHERE term IN ({placeholders}) '
+            f'UNION ALL '
+            f'SELECT {post}.id, {group_term}.weight FROM {group_term} '
+            f'INNER JOIN {post} ON {post}.group_id = {group_term}.group_id '
+            f'WHERE {group_term}.term IN ({placeholders})'
+            f') matches GROUP BY matches.post_id'
+            f') {self.table_alias} ON {self.table_alias}.post_id = '
+            f'{compiler.quote_name_unless_alias(self.parent_alias)}.id'
+        )
+        return sql, [*self.terms, *self.terms]
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(
+            self.terms,
+            change_map.get(self.parent_alias, self.parent_alias),
+            change_map.get(self.table_alias, self.table_alias),
+        )
+
+    def equals(self, other, with_filtered_relation):
+        return (
+            isinstance(other, self.__class__)
+            and self.terms == other.terms
+            and self.parent_alias == other.parent_alias
+        )
+
+
+def search(query):
+    """Посты по запросу, самые релевантные первыми. Релевантность -
+    сумма весов совпавших термов поста и его группы, посчитанная
+    в подзапросе, с которым посты соединяются одним JOIN."""
+    terms = sorted(set(text_terms(query)))
+    if not terms:
+        return Post.objects.none()
+    posts = Post.objects.all()
+    alias = posts.query.join(
+        RankJoin(terms, posts.query.get_initial_alias()))
+    return posts.annotate(
+        rank=RawSQL(f'{alias}.rank', [], output_field=IntegerField())
+    ).order_by('-rank', '-pub_date', '-id')
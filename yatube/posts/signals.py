@@ -0,0 +1,107 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import tasks
+from .cache import (
+    bump_version, group_scope, post_scope, post_scopes, profile_scope
+)
+from .models import Comment, Follow, Group, Post
+from .search import index_group
+from .utils import forget_followed_authors
+
+
+def bump_post_scopes(post):
+    scopes = post_scopes(post) | {post_scope(post.pk)}
+    old_group_id = getattr(post, '_old_group_id', None)
+    if old_group_id is not None:
+        scopes.add(group_scope(old_group_id))
+    bump_version(*scopes)
+
+
+def group_author_ids(group):
+    return list(
+        Post.objects.filter(group=group).order_by().values_list(
+            'author', flat=True).distinct()
+    )
+
+
+def bump_group_scopes(group, author_ids):
+    bump_version(
+        'index',
+        group_scope(group.pk),
+        *(profile_scope(author_id) for author_id in author_ids),
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    # Пост могли перенести в другую группу - её страницы тоже устарели.
+    # Старый текст нужен, чтобы не перестраивать поисковый индекс зря.
+    if instance.pk is not None and not raw:
+        old = Post.objects.filter(
+            pk=instance.pk).values_list('group', 'text').first()
+        instance._old_group_id, instance._old_text = old or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    bump_post_scopes(instance)
+    if created and not raw:
+        tasks.change_stats.defer(instance.author_id, 'posts_count', 1)
+        tasks.fan_out.defer(instance.pk)
+    if not raw and (
+        created or instance.text != getattr(instance, '_old_text', None)
+    ):
+        tasks.index_posts.defer(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_post_scopes(instance)
+    tasks.change_stats.defer(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, raw=False, **kwargs):
+    bump_group_scopes(instance, group_author_ids(instance))
+    if not raw:
+        index_group(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # После удаления у постов уже не будет группы, авторов ищем заранее.
+    instance._author_ids = group_author_ids(instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    bump_group_scopes(instance, getattr(instance, '_author_ids', ()))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    bump_version(post_scope(instance.post_id))
+    if created and not raw:
+        tasks.change_comments_count.defer(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump_version(post_scope(instance.post_id))
+    tasks.change_comments_count.defer(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    forget_followed_authors(instance.user_id)
+    if created and not raw:
+        tasks.followed.defer(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    forget_followed_authors(instance.user_id)
+    tasks.unfollowed.defer(instance.user_id, instance.author_id)
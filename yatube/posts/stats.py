@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .feed import update_delivery
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def author_stats(user):
+    """Счётчики автора; для автора без записи - нулевые."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def increment_stats(user_id, field, amount=1):
+    updated = AuthorStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + amount}
+    )
+    if not updated:
+        stats, created = AuthorStats.objects.get_or_create(
+            user_id=user_id, defaults={field: amount}
+        )
+        if not created:
+            increment_stats(user_id, field, amount)
+
+
+def decrement_stats(user_id, field, amount=1):
+    # Запись не создаётся: при каскадном удалении автора её уже нет.
+    AuthorStats.objects.filter(
+        user_id=user_id, **{f'{field}__gte': amount}
+    ).update(**{field: F(field) - amount})
+
+
+def change_comments_count(post_id, delta):
+    # Счётчик - производные данные, пост от него не считается изменённым.
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta,
+        updated_at=F('updated_at'),
+    )
+
+
+def recount(fix=True):
+    """Пересчитывает счётчики по данным и возвращает число
+    расхождений. С fix=True исправляет их."""
+    posts = dict(
+        Post.objects.order_by().values_list('author').annotate(Count('pk'))
+    )
+    followers = dict(
+        Follow.objects.order_by().values_list('author').annotate(Count('pk'))
+    )
+    to_create, to_update = [], []
+    users = User.objects.select_related('stats')
+    for user in users.iterator():
+        actual = AuthorStats(
+            user_id=user.pk,
+            posts_count=posts.get(user.pk, 0),
+            followers_count=followers.get(user.pk, 0),
+        )
+        try:
+            stats = user.stats
+        except AuthorStats.DoesNotExist:
+            if actual.posts_count or actual.followers_count:
+                to_create.append(actual)
+            continue
+        if (
+            stats.posts_count != actual.posts_count
+            or stats.followers_count != actual.followers_count
+        ):
+            to_update.append(actual)
+
+    comments = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by().values('post').annotate(count=Count('pk')).values('count')
+    drifted_posts = Post.objects.annotate(
+        actual_comments=Coalesce(Subquery(comments), 0)
+    ).exclude(comments_count=F('actual_comments'))
+    drifted_posts_count = drifted_posts.count()
+
+    if fix:
+        AuthorStats.objects.bulk_create(to_create)
+        AuthorStats.objects.bulk_update(
+            to_update, ['posts_count', 'followers_count'], batch_size=1000
+        )
+        Post.objects.filter(
+            pk__in=drifted_posts.values('pk')
+        ).update(
+            comments_count=Coalesce(Subquery(comments), 0),
+            updated_at=F('updated_at'),
+        )
+    # Режим доставки в ленты сверяется уже с исправленными счётчиками.
+    limit = settings.FEED_FANOUT_LIMIT
+    wrong_delivery = AuthorStats.objects.filter(
+        Q(followers_count__gt=limit, feed_pulled=False)
+        | Q(followers_count__lte=limit, feed_pulled=True)
+    ).values_list('user', flat=True)
+    if fix:
+        wrong_delivery_count = sum(
+            update_delivery(author_id) for author_id in list(wrong_delivery)
+        )
+    else:
+        wrong_delivery_count = wrong_delivery.count()
+    return (
+        len(to_create) + len(to_update) + drifted_posts_count
+        + wrong_delivery_count
+    )
@@ -0,0 +1,76 @@
+from collections import Counter
+
+from core.jobs import task
+
+from . import stats
+from .feed import backfill, fan_out_post, prune, update_delivery
+from .models import Post, PostTerm, User
+from .search import text_terms
+from .thumbnails import generate
+
+
+@task(priority=10, batch=True)
+def change_stats(items):
+    """Счётчики авторов: изменения одного поля складываются,
+    на пару (автор, поле) приходится один UPDATE."""
+    deltas = Counter()
+    for user_id, field, delta in items:
+        deltas[user_id, field] += delta
+    for (user_id, field), delta in deltas.items():
+        if delta > 0:
+            stats.increment_stats(user_id, field, delta)
+        elif delta < 0:
+            stats.decrement_stats(user_id, field, -delta)
+
+
+@task(priority=10, batch=True)
+def change_comments_count(items):
+    deltas = Counter()
+    for post_id, delta in items:
+        deltas[post_id] += delta
+    for post_id, delta in deltas.items():
+        if delta:
+            stats.change_comments_count(post_id, delta)
+
+
+@task(priority=5, batch=True)
+def fan_out(items):
+    """Раскладывает посты по лентам; удалённые до выполнения
+    посты пропускаются."""
+    for post in Post.objects.filter(pk__in={pk for pk, in items}):
+        fan_out_post(post)
+
+
+@task(priority=5)
+def followed(user_id, author_id):
+    stats.increment_stats(author_id, 'followers_count')
+    update_delivery(author_id)
+    backfill(User(pk=user_id), User(pk=author_id))
+
+
+@task(priority=5)
+def unfollowed(user_id, author_id):
+    stats.decrement_stats(author_id, 'followers_count')
+    prune(User(pk=user_id), User(pk=author_id))
+    update_delivery(author_id)
+
+
+@task(batch=True)
+def index_posts(items):
+    """Перестраивает индекс постов одним DELETE и одним INSERT;
+    повторные правки одного поста индексируются один раз."""
+    posts = list(Post.objects.filter(
+        pk__in={pk for pk, in items}).values_list('pk', 'text'))
+    PostTerm.objects.filter(post__in=[pk for pk, _ in posts]).delete()
+    PostTerm.objects.bulk_create(
+        PostTerm(term=term, post_id=pk, weight=weight)
+        for pk, text in posts
+        for term, weight in text_terms(text).items()
+    )
+
+
+@task(priority=-5)
+def make_thumbnails(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None and post.image:
+        generate(post)
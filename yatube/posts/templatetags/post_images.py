@@ -0,0 +1,37 @@
+from django import template
+
+from core.profiling import section
+
+from ..thumbnails import cached_thumbnail, enqueue, thumbnail_variants
+
+register = template.Library()
+
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+@register.inclusion_tag('posts/includes/image.html')
+def post_image(post):
+    """Картинка поста с вариантами разного размера и формата в srcset.
+    Если миниатюр ещё нет, выводится заглушка, а их создание уходит
+    в фоновый пул."""
+    context = {'image': post.image, 'thumbnail': None, 'sizes': SIZES}
+    if post.image:
+        with section('thumbnails'):
+            context.update(thumbnail_context(post))
+    return context
+
+
+def thumbnail_context(post):
+    thumbnail = cached_thumbnail(post.image)
+    if thumbnail is None:
+        enqueue(post)
+        return {}
+    return {'thumbnail': thumbnail, 'sources': [
+        {
+            'type': f'image/{format_.lower()}',
+            'srcset': ', '.join(
+                f'{file.url} {width}w' for width, file in variants
+            ),
+        }
+        for format_, variants in thumbnail_variants(post.image).items()
+    ]}
@@ -0,0 +1,40 @@
+from django import template
+
+from ..cache import get_or_render
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, scope, vary_on):
+        self.nodelist = nodelist
+        self.scope = scope
+        self.vary_on = vary_on
+
+    def render(self, context):
+        scope = self.scope.resolve(context)
+        if not scope:
+            return self.nodelist.render(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return get_or_render(
+            scope, vary_on, lambda: self.nodelist.render(context)
+        )
+
+
+@register.tag
+def versioned_cache(parser, token):
+    """Кэширует фрагмент до изменения данных области:
+    {% versioned_cache 'index' page_obj.number %} ... {% endversioned_cache %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f'Тег {bits[0]!r} ожидает хотя бы область кэша.'
+        )
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    return VersionedCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
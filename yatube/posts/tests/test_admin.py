@@ -0,0 +1,69 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..fts import create_fts_tables, fts_filter, fts_table
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 есть только в SQLite')
+class AdminSearchTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.post = Post.objects.create(
+            author=self.admin, text='Рыжий кот спит на диване')
+        Post.objects.create(author=self.admin, text='Собака гуляет')
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.admin, text='Какой Котёнок!')
+
+    def search(self, model, term):
+        url = reverse(f'admin:posts_{model._meta.model_name}_changelist')
+        response = self.client.get(url, {'q': term})
+        return list(response.context['cl'].result_list)
+
+    def test_admin_search_uses_fts(self):
+        """Поиск в админке находит посты и комментарии по префиксам слов
+        без учёта регистра."""
+        self.assertEqual(self.search(Post, 'рыж КОТ'), [self.post])
+        self.assertEqual(self.search(Comment, 'котён'), [self.comment])
+        self.assertEqual(self.search(Post, 'кошка'), [])
+
+    def test_fallback_without_fts(self):
+        """Без FTS5 работает обычный поиск по search_fields."""
+        with mock.patch('posts.admin.fts_available', return_value=False):
+            self.assertEqual(self.search(Post, 'ий ко'), [self.post])
+
+    def test_index_follows_update_and_delete(self):
+        """Триггеры обновляют индекс при изменении и удалении строк."""
+        Post.objects.filter(pk=self.post.pk).update(text='Белый пёс')
+        posts = Post.objects.all()
+        self.assertFalse(fts_filter(posts, 'кот').exists())
+        self.assertEqual(list(fts_filter(posts, 'пёс')), [self.post])
+        self.post.delete()
+        self.assertFalse(fts_filter(posts, 'пёс').exists())
+
+    def test_search_without_words_finds_nothing(self):
+        """Поиск из одних знаков препинания ничего не находит."""
+        self.assertEqual(self.search(Post, '!!!'), [])
+        self.assertFalse(fts_filter(Post.objects.all(), '-').exists())
+
+    def test_lost_triggers_are_restored(self):
+        """После пересоздания таблицы миграцией триггеры восстанавливаются,
+        а индекс перестраивается."""
+        fts = fts_table(Post)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {fts}_insert')
+        post = Post.objects.create(author=self.admin, text='Попугай')
+        create_fts_tables()
+        posts = Post.objects.all()
+        self.assertEqual(list(fts_filter(posts, 'попугай')), [post])
+        other = Post.objects.create(author=self.admin, text='Хомяк')
+        self.assertEqual(list(fts_filter(posts, 'хомяк')), [other])
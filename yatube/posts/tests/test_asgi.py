@@ -0,0 +1,277 @@
+import asyncio
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.asgi import ASGIHandler
+from posts.models import Post
+
+User = get_user_model()
+
+
+def http_scope(path, method='GET', query_string=b'', headers=()):
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'query_string': query_string,
+        'headers': [(b'host', b'testserver'), *headers],
+        'server': ('testserver', 80),
+        'client': ('10.0.0.1', 40000),
+    }
+
+
+def call(application, scope, body_chunks=(b'',)):
+    """Вызывает ASGI-приложение и возвращает отправленные сообщения."""
+    messages = [
+        {'type': 'http.request', 'body': chunk, 'more_body': True}
+        for chunk in body_chunks
+    ]
+    messages[-1]['more_body'] = False
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Как у сервера: после тела запроса ждём разрыва соединения.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return sent
+
+
+def response_body(sent):
+    return b''.join(
+        message.get('body', b'')
+        for message in sent
+        if message['type'] == 'http.response.body'
+    )
+
+
+class ASGIViewsTest(TransactionTestCase):
+    """Транзакционный тест: view выполняются в потоках пула
+    со своими подключениями к базе."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Yusuf')
+        self.post = Post.objects.create(
+            author=self.user, text='Пост через ASGI')
+        self.application = ASGIHandler(get_wsgi_application(), 2)
+
+    def tearDown(self):
+        self.application.executor.shutdown()
+
+    def test_read_views(self):
+        """View чтения отдают через ASGI ту же страницу, что и через WSGI."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'Yusuf'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                sent = call(self.application, http_scope(url))
+                self.assertEqual(sent[0]['type'], 'http.response.start')
+                self.assertEqual(sent[0]['status'], 200)
+                self.assertIn(
+                    (b'content-type', b'text/html; charset=utf-8'),
+                    sent[0]['headers'],
+                )
+                self.assertFalse(sent[-1].get('more_body', False))
+                self.assertIn(
+                    'Пост через ASGI', response_body(sent).decode())
+
+    def test_query_string_and_not_found(self):
+        """Строка запроса доходит до view, неизвестный адрес - 404."""
+        sent = call(self.application, http_scope(
+            reverse('posts:search'), query_string='q=ASGI'.encode()))
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn('Пост через ASGI', response_body(sent).decode())
+        sent = call(self.application, http_scope('/no-such-page/'))
+        self.assertEqual(sent[0]['status'], 404)
+
+
+class ASGIHandlerTest(SimpleTestCase):
+    def test_request_body_and_streaming_response(self):
+        """Тело запроса из нескольких сообщений собирается целиком,
+        а потоковый ответ отправляется по кускам."""
+        received = {}
+
+        def wsgi_application(environ, start_response):
+            received['body'] = environ['wsgi.input'].read()
+            received['content_type'] = environ['CONTENT_TYPE']
+            received['cookie'] = environ['HTTP_COOKIE']
+            received['path'] = environ['PATH_INFO']
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return iter([b'first', b'', b'second'])
+
+        application = ASGIHandler(wsgi_application, 1)
+        self.addCleanup(application.executor.shutdown)
+        sent = call(
+            application,
+            http_scope('/путь/', method='POST', headers=[
+                (b'content-type', b'text/plain'),
+                (b'cookie', b'a=1'),
+            ]),
+            body_chunks=(b'hello ', b'world'),
+        )
+        self.assertEqual(received['body'], b'hello world')
+        self.assertEqual(received['content_type'], 'text/plain')
+        self.assertEqual(received['cookie'], 'a=1')
+        self.assertEqual(
+            received['path'].encode('latin-1').decode(), '/путь/')
+        self.assertEqual(
+            [message.get('body') for message in sent[1:]],
+            [b'first', b'second', b''],
+        )
+        self.assertEqual(
+            [message.get('more_body', False) for message in sent[1:]],
+            [True, True, False],
+        )
+
+    def test_disconnect_during_body_skips_view(self):
+        """Если клиент ушёл, не дослав тело, view не вызывается
+        и ответ не отправляется."""
+        calls = []
+
+        def wsgi_application(environ, start_response):
+            calls.append(environ['wsgi.input'].read())
+            start_response('200 OK', [])
+            return [b'']
+
+        application = ASGIHandler(wsgi_application, 1)
+        self.addCleanup(application.executor.shutdown)
+        messages = [
+            {'type': 'http.request', 'body': b'text=hel', 'more_body': True},
+            {'type': 'http.disconnect'},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = http_scope(
+            '/create/', method='POST', headers=[(b'content-length', b'20')])
+        asyncio.run(application(scope, receive, send))
+        self.assertEqual(calls, [])
+        self.assertEqual(sent, [])
+
+    def test_failed_send_releases_worker(self):
+        """Если отправка ответа упала, поток пула закрывает ответ
+        и освобождается, а не ждёт места в очереди."""
+        closed = []
+
+        class Response:
+            def __iter__(self):
+                for _ in range(1000):
+                    yield b'chunk'
+
+            def close(self):
+                closed.append(True)
+
+        def wsgi_application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return Response()
+
+        application = ASGIHandler(wsgi_application, 1)
+        self.addCleanup(application.executor.shutdown)
+        sent = []
+        messages = [{'type': 'http.request', 'body': b''}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if len(sent) == 3:
+                raise OSError('соединение разорвано')
+            sent.append(message)
+
+        async def request():
+            await application(http_scope('/'), receive, send)
+
+        with self.assertRaises(OSError):
+            asyncio.run(asyncio.wait_for(request(), timeout=5))
+        self.assertEqual(closed, [True])
+        # Единственный поток пула снова свободен.
+        self.assertEqual(
+            application.executor.submit(lambda: 'ok').result(timeout=5),
+            'ok')
+
+    def test_disconnect_stops_streaming(self):
+        """После http.disconnect ответ больше не читается."""
+        chunks = []
+        closed = []
+
+        class Response:
+            def __iter__(self):
+                for _ in range(1000):
+                    chunks.append(True)
+                    yield b'chunk'
+
+            def close(self):
+                closed.append(True)
+
+        def wsgi_application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return Response()
+
+        application = ASGIHandler(wsgi_application, 1)
+        self.addCleanup(application.executor.shutdown)
+
+        async def request():
+            gone = asyncio.Event()
+            messages = [{'type': 'http.request', 'body': b''}]
+
+            async def receive():
+                if messages:
+                    return messages.pop(0)
+                await gone.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.body':
+                    gone.set()
+                    await asyncio.sleep(0.01)
+
+            await application(http_scope('/'), receive, send)
+
+        asyncio.run(asyncio.wait_for(request(), timeout=5))
+        self.assertEqual(closed, [True])
+        self.assertLess(len(chunks), 1000)
+
+    def test_lifespan(self):
+        """Сервер получает подтверждение запуска и остановки."""
+        from yatube.asgi import application
+
+        self.assertEqual(
+            application.executor._max_workers, settings.ASGI_THREADS)
+        messages = [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(application({'type': 'lifespan'}, receive, send))
+        self.assertEqual(
+            [message['type'] for message in sent],
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete'],
+        )
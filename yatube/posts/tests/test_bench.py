@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..management.commands.bench_views import VIEWS
+from ..models import Comment, Post
+
+
+class BenchViewsTest(TestCase):
+    def setUp(self):
+        call_command(
+            'seed_data', users=10, groups=2, posts=30, comments=30,
+            follows=3, images=0, stdout=StringIO(),
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, 'bench.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def bench(self, *args):
+        call_command(
+            'bench_views', '--requests', '2', *args, stdout=StringIO())
+
+    def test_bench_views_saves_results(self):
+        """Результаты замера всех view сохраняются в JSON, а созданные
+        во время замера записи откатываются."""
+        self.bench('--output', self.output)
+        with open(self.output, encoding='utf-8') as file:
+            results = json.load(file)
+        self.assertEqual(set(results['views']), set(VIEWS))
+        for name, result in results['views'].items():
+            with self.subTest(view=name):
+                self.assertLess(result['status'], 400)
+                self.assertLessEqual(result['p50'], result['p99'])
+                self.assertGreater(result['rps'], 0)
+                self.assertGreater(result['queries'], 0)
+        self.assertGreater(results['views']['index']['bytes'], 0)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 30)
+
+    def test_compare_reports_regressions(self):
+        """Сравнение с прошлым запуском находит регрессии."""
+        self.bench('--views', 'index', '--output', self.output)
+        with open(self.output, encoding='utf-8') as file:
+            results = json.load(file)
+        results['views']['index']['queries'] = 1
+        with open(self.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file)
+        with self.assertRaisesMessage(CommandError, 'Регрессий'):
+            self.bench(
+                '--views', 'index', '--compare', self.output,
+                '--fail-on-regression',
+            )
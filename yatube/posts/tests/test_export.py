@@ -0,0 +1,122 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..export import export_stream
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user(username='Yusuf')
+        cls.other = User.objects.create_user(username='Other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост, "с кавычками"')
+        cls.other_post = Post.objects.create(author=cls.other, text='Чужой')
+        cls.comment = Comment.objects.create(
+            post=cls.other_post, author=cls.user, text='Комментарий')
+        Comment.objects.create(
+            post=cls.post, author=cls.other, text='Чужой комментарий')
+        Follow.objects.create(user=cls.user, author=cls.other)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get(self, **params):
+        response = self.client.get(reverse('posts:export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_export_contains_only_own_data(self):
+        """NDJSON: по строке на пост, комментарий и подписку
+        пользователя, чужие данные не попадают."""
+        response, content = self.get()
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(
+            [(row['type'], row.get('id')) for row in rows],
+            [
+                ('post', self.post.pk),
+                ('comment', self.comment.pk),
+                ('follow', None),
+            ],
+        )
+        self.assertEqual(rows[0]['text'], self.post.text)
+        self.assertEqual(rows[0]['group'], 'group')
+        self.assertEqual(rows[1]['post'], self.other_post.pk)
+        self.assertEqual(rows[2]['author'], 'Other')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/x-ndjson'))
+
+    def test_csv_export(self):
+        """CSV читается обратно с заголовком и экранированием."""
+        response, content = self.get(format='csv')
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['text'], self.post.text)
+        self.assertEqual(rows[2]['author'], 'Other')
+        self.assertIn('.csv"', response['Content-Disposition'])
+
+    def test_gzip_export(self):
+        """С gzip=1 выгрузка сжимается на лету."""
+        response, content = self.get(gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.ndjson.gz"', response['Content-Disposition'])
+        self.assertEqual(
+            len(gzip.decompress(content).decode().splitlines()), 3)
+
+    def test_export_is_lazy(self):
+        """Запросы к базе идут только при чтении потока."""
+        with self.assertNumQueries(0):
+            chunks = export_stream(self.user)
+        with self.assertNumQueries(3):
+            list(chunks)
+
+    def test_export_requires_login_and_known_format(self):
+        """Гостя отправляют на вход, неизвестный формат - 404."""
+        response = Client().get(reverse('posts:export'))
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(reverse('posts:export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_command_exports_changes_since(self):
+        """Команда пишет в файл только изменённое после --since,
+        подписки - всегда."""
+        since = timezone.now()
+        Post.objects.filter(pk=self.post.pk).update(
+            updated_at=since + timedelta(minutes=1))
+        handle, path = tempfile.mkstemp(suffix='.ndjson.gz')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command(
+            'export_user_data', 'Yusuf', gzip=True, output=path,
+            since=since.isoformat(),
+        )
+        with gzip.open(path, 'rt', encoding='utf-8') as export:
+            rows = [json.loads(line) for line in export]
+        self.assertEqual(
+            [row['type'] for row in rows], ['post', 'follow'])
+
+    def test_command_writes_to_stdout(self):
+        """Без --output выгрузка идёт в стандартный вывод."""
+        out = io.StringIO()
+        call_command('export_user_data', 'Yusuf', format='csv', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
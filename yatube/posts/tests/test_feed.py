@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from ..feed import backfill_followers, follow_feed, is_celebrity
+from ..models import AuthorStats, FeedItem, Follow, Post
+from ..stats import recount
+
+User = get_user_model()
+
+
+class FollowFeedTest(TestCase):
+    def setUp(self):
+        self.follower = User.objects.create_user(username='Follower')
+        self.author = User.objects.create_user(username='Yusuf')
+        self.other = User.objects.create_user(username='Other')
+        self.old_post = Post.objects.create(
+            author=self.author,
+            text='Пост до подписки',
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые посты автора в ленту,
+        отписка убирает их."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(list(follow_feed(self.follower)), [self.old_post])
+        Follow.objects.filter(user=self.follower, author=self.author).delete()
+        self.assertFalse(FeedItem.objects.filter(user=self.follower).exists())
+        self.assertEqual(list(follow_feed(self.follower)), [])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков автора
+        и только в них."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        Post.objects.create(author=self.other, text='Чужой пост')
+        self.assertEqual(
+            list(follow_feed(self.follower)), [post, self.old_post]
+        )
+        self.assertEqual(list(follow_feed(self.other)), [])
+
+    def test_deleted_post_leaves_feed(self):
+        """Удалённый пост пропадает из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.old_post.delete()
+        self.assertEqual(list(follow_feed(self.follower)), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_celebrity_posts_are_merged_on_read(self):
+        """Посты автора с большим числом подписчиков не раскладываются
+        по лентам, а подмешиваются при чтении."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=self.author, author=self.other)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        other_post = Post.objects.create(author=self.other, text='Пост')
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        self.assertEqual(
+            list(follow_feed(self.follower)), [post, self.old_post]
+        )
+        self.assertEqual(list(follow_feed(self.author)), [other_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_crossing_fanout_limit_keeps_all_posts(self):
+        """Когда автор становится знаменитостью и обратно, в лентах
+        остаются все его посты без повторов."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        self.assertTrue(is_celebrity(self.author))
+        pulled_post = Post.objects.create(
+            author=self.author, text='Пост знаменитости')
+        self.assertFalse(FeedItem.objects.filter(post=pulled_post).exists())
+        expected = [pulled_post, self.old_post]
+        self.assertEqual(list(follow_feed(self.follower)), expected)
+
+        Follow.objects.filter(user=self.other).delete()
+        self.assertFalse(is_celebrity(self.author))
+        self.assertEqual(list(follow_feed(self.follower)), expected)
+        pushed_post = Post.objects.create(
+            author=self.author, text='Пост после спада')
+        expected.insert(0, pushed_post)
+        self.assertEqual(list(follow_feed(self.follower)), expected)
+
+        Follow.objects.create(user=self.other, author=self.author)
+        self.assertTrue(is_celebrity(self.author))
+        self.assertEqual(list(follow_feed(self.follower)), expected)
+        self.assertEqual(list(follow_feed(self.other)), expected)
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_recount_fixes_delivery_mode(self):
+        """recount_stats приводит режим доставки к числу подписчиков
+        и раскладывает посты по лентам."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        AuthorStats.objects.filter(user=self.author).update(feed_pulled=True)
+        FeedItem.objects.all().delete()
+        self.assertEqual(recount(), 1)
+        self.assertFalse(is_celebrity(self.author))
+        self.assertEqual(list(follow_feed(self.follower)), [self.old_post])
+
+    def test_backfill_followers_handles_many_posts(self):
+        """Раскладка сотен постов не упирается в лимит SQLite
+        на число строк в одном INSERT."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(600)
+        )
+        FeedItem.objects.all().delete()
+        backfill_followers(self.author.pk)
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.follower).count(), 601)
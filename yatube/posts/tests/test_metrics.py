@@ -0,0 +1,106 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class MetricsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Yusuf')
+        self.client = Client()
+
+    def test_requests_are_counted_per_url_name(self):
+        """Запросы, время ответа и число SQL-запросов учитываются
+        по имени URL."""
+        before = metrics.requests_total.get(
+            view='posts:index', method='GET', status=200)
+        queries_before = metrics.request_queries.count(view='posts:index')
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.client.get('/no-such-page/')
+        self.assertEqual(
+            metrics.requests_total.get(
+                view='posts:index', method='GET', status=200),
+            before + 2,
+        )
+        self.assertEqual(
+            metrics.request_queries.count(view='posts:index'),
+            queries_before + 2,
+        )
+        self.assertGreater(
+            metrics.requests_total.get(
+                view='unmatched', method='GET', status=404),
+            0,
+        )
+
+    def test_fragment_cache_and_thumbnails_are_measured(self):
+        """Учитываются попадания в кэш фрагментов и создание миниатюр."""
+        hits = metrics.fragment_cache.get(kind='index', outcome='hits')
+        thumbnails = metrics.thumbnail_duration.count()
+        self.client.force_login(self.user)
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Пост',
+            'image': SimpleUploadedFile(
+                'a.gif', SMALL_GIF, content_type='image/gif'),
+        })
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            metrics.fragment_cache.get(kind='index', outcome='hits'),
+            hits + 1,
+        )
+        self.assertEqual(metrics.thumbnail_duration.count(), thumbnails + 1)
+
+    def test_metrics_endpoint(self):
+        """/metrics/ отдаёт метрики в формате Prometheus
+        только внутренним адресам."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '# TYPE yatube_requests_total counter')
+        self.assertContains(
+            response,
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"}',
+        )
+        response = Client(REMOTE_ADDR='10.0.0.1').get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """С METRICS_TOKEN нужен токен, адрес не важен: за прокси
+        все запросы приходят с 127.0.0.1."""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 404)
+        response = Client(REMOTE_ADDR='10.0.0.1').get(
+            url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
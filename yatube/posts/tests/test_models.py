@@ -1,7 +1,14 @@
+from unittest import skipUnless
+
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.utils import timezone
 
-from ..models import Post, Group
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -30,3 +37,102 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         title = group.title
         self.assertEqual(title, 'Тестовая группа')
+
+
+class UpdatedAtTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.past = timezone.now() - timedelta(days=1)
+        Post.objects.filter(pk=self.post.pk).update(updated_at=self.past)
+
+    def updated_at(self):
+        return Post.objects.get(pk=self.post.pk).updated_at
+
+    def test_save_and_update_set_updated_at(self):
+        """Дата изменения сдвигается при save() и при массовом update(),
+        дата создания остаётся прежней."""
+        self.post.text = 'Правка'
+        self.post.save()
+        self.assertGreater(self.updated_at(), self.past)
+        Post.objects.filter(pk=self.post.pk).update(updated_at=self.past)
+        Post.objects.filter(pk=self.post.pk).update(text='Ещё правка')
+        self.assertGreater(self.updated_at(), self.past)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).pub_date, self.post.pub_date)
+
+    def test_counters_do_not_change_updated_at(self):
+        """Новый комментарий меняет счётчик поста, но не дату изменения."""
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Пост', updated_at=F('updated_at'))
+        self.assertEqual(self.updated_at(), self.past)
+
+    def test_changed_since(self):
+        """changed_since отдаёт новые и изменённые позже момента записи."""
+        new = Post.objects.create(author=self.user, text='Новый')
+        since = self.past + timedelta(hours=1)
+        self.assertEqual(list(Post.objects.changed_since(since)), [new])
+        self.assertEqual(
+            list(Post.objects.filter(author=self.user).changed_since(
+                self.past - timedelta(hours=1)).order_by('pk')),
+            [self.post, new],
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Планы запросов SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'user_{i}') for i in range(5)
+        ]
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.bulk_create(
+            Post(
+                author=cls.users[i % 5],
+                group=cls.group if i % 2 else None,
+                text=f'Пост {i}',
+            )
+            for i in range(500)
+        )
+        cls.post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.users[i % 5], text='Текст')
+            for i in range(100)
+        )
+        for author in cls.users[1:]:
+            Follow.objects.create(user=cls.users[0], author=author)
+
+    def assertIndexScan(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds_are_sorted_by_index(self):
+        """Ленты главной, группы, профиля и комментарии поста
+        выбираются уже отсортированными по индексу."""
+        cases = {
+            'post_pub_date_idx': Post.objects.select_related(
+                'author', 'group'),
+            'post_group_pub_date_idx': Post.objects.filter(group=self.group),
+            'post_author_pub_date_idx': Post.objects.filter(
+                author=self.users[1]),
+            'comment_post_pub_date_idx': Comment.objects.filter(
+                post=self.post).order_by('pub_date'),
+        }
+        for index_name, queryset in cases.items():
+            with self.subTest(index_name=index_name):
+                self.assertIndexScan(queryset[:10], index_name)
+
+    def test_follow_feed_does_not_scan_posts(self):
+        """Лента подписок читает посты по индексу, а не полным сканом."""
+        plan = Post.objects.filter(
+            author__following__user=self.users[0])[:10].explain()
+        self.assertNotRegex(plan, r'SCAN (TABLE )?posts_post(?! USING)')
+
+    def test_follow_lookup_by_author_uses_index(self):
+        """Проверка подписки по автору использует индекс."""
+        plan = Follow.objects.filter(author=self.users[1]).explain()
+        self.assertIn('follow_author_user_idx', plan)
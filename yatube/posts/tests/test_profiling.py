@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..utils import pagination
+
+User = get_user_model()
+
+PROFILING_DIR = tempfile.mkdtemp()
+
+
+def slow_pagination(*args, **kwargs):
+    time.sleep(0.05)
+    return pagination(*args, **kwargs)
+
+
+@override_settings(
+    PROFILING_SAMPLE_RATE=1,
+    PROFILING_SLOW_MS=30,
+    PROFILING_INTERVAL_MS=2,
+    PROFILING_DIR=PROFILING_DIR,
+)
+class SampledProfilingTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='Yusuf')
+        Post.objects.create(author=user, text='Пост')
+
+    def test_sampled_request_breakdown_is_logged(self):
+        """Для замеренного запроса в лог пишется время view, SQL
+        и шаблонов, вместе равное общему времени."""
+        with self.assertLogs('yatube.profiling', 'INFO') as logs:
+            Client().get(reverse('posts:index'))
+        record = logs.records[0]
+        self.assertIn('posts:index', record.getMessage())
+        breakdown = record.profile
+        for name in ('view', 'sql', 'template', 'total'):
+            self.assertIn(name, breakdown)
+        self.assertAlmostEqual(
+            sum(ms for name, ms in breakdown.items() if name != 'total'),
+            breakdown['total'],
+            delta=0.1,
+        )
+
+    def test_slow_request_dumps_collapsed_stacks(self):
+        """Для медленного запроса сохраняются свёрнутые стеки с view."""
+        # Под нагрузкой медленным может оказаться и запрос другого теста.
+        before = set(os.listdir(PROFILING_DIR))
+        with mock.patch('posts.views.pagination', slow_pagination):
+            with self.assertLogs('yatube.profiling', 'INFO'):
+                Client().get(reverse('posts:index'))
+        files = [
+            name for name in set(os.listdir(PROFILING_DIR)) - before
+            if 'posts-index' in name
+        ]
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(PROFILING_DIR, files[0])) as file:
+            stacks = file.read()
+        self.assertIn('posts.views.index;', stacks)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_profiling_disabled(self):
+        """При нулевой доле запросы не замеряются."""
+        with mock.patch('core.middleware.logger') as logger:
+            Client().get(reverse('posts:index'))
+        logger.info.assert_not_called()
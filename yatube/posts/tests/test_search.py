@@ -0,0 +1,109 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, PostTerm
+from ..search import search, stem
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Yusuf')
+        self.group = Group.objects.create(
+            title='Наши кошки',
+            slug='cats',
+            description='Всё о домашних животных',
+        )
+
+    def test_stem_matches_word_forms(self):
+        """Разные формы слова сводятся к одной основе."""
+        self.assertEqual(stem('котами'), stem('кот'))
+        self.assertEqual(stem('красивые'), stem('красивый'))
+        self.assertEqual(stem('Django'), 'django')
+
+    def test_search_finds_word_forms_and_ranks(self):
+        """Поиск находит посты по другим формам слова, посты с большим
+        числом совпадений выводятся выше."""
+        once = Post.objects.create(author=self.author, text='Мой кот спит')
+        twice = Post.objects.create(
+            author=self.author, text='Коты и котами: про котов')
+        Post.objects.create(author=self.author, text='Собака гуляет')
+        self.assertEqual(list(search('котам')), [twice, once])
+        self.assertFalse(search('и').exists())
+
+    def test_search_by_group(self):
+        """Посты находятся по названию и описанию их группы."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group)
+        self.assertEqual(list(search('кошка')), [post])
+        self.assertEqual(list(search('животные')), [post])
+        self.group.title = 'Собаководы'
+        self.group.save()
+        self.assertFalse(search('кошка').exists())
+
+    def test_rank_sums_post_and_group_terms(self):
+        """Ранг складывается из весов термов поста и его группы
+        и считается одним запросом."""
+        own = Post.objects.create(author=self.author, text='Кошка и кошка')
+        grouped = Post.objects.create(
+            author=self.author, text='Пост', group=self.group)
+        both = Post.objects.create(
+            author=self.author, text='Кошка', group=self.group)
+        with self.assertNumQueries(1):
+            found = [(post, post.rank) for post in search('кошки')]
+        self.assertEqual(found, [(both, 4), (grouped, 3), (own, 2)])
+
+    def test_search_needs_no_views(self):
+        """Поиск не держит в базе представлений: SQLite не смог бы
+        пересоздать таблицы, на которые они ссылаются."""
+        with connection.cursor() as cursor:
+            tables = connection.introspection.get_table_list(cursor)
+        views = [table.name for table in tables if table.type == 'v']
+        self.assertEqual(views, [])
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.create(author=self.author, text='Старый текст')
+        post.text = 'Новый текст'
+        post.save()
+        self.assertFalse(search('старый').exists())
+        self.assertEqual(list(search('новый')), [post])
+        post.delete()
+        self.assertFalse(PostTerm.objects.exists())
+
+    def test_search_page(self):
+        """Страница поиска выводит найденные посты и сохраняет запрос
+        в ссылках пагинатора."""
+        for number in range(12):
+            Post.objects.create(author=self.author, text=f'Кот номер {number}')
+        response = Client().get(reverse('posts:search'), {'q': 'коты'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertEqual(response.context['query'], 'коты')
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82%D1%8B&amp;page=2')
+
+    def test_rebuild_search_index(self):
+        """Команда rebuild_search_index восстанавливает индекс."""
+        post = Post.objects.create(author=self.author, text='Кот')
+        PostTerm.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(list(search('кот')), [post])
+
+    def test_rebuild_search_index_since(self):
+        """С --since перестраиваются только посты, изменённые позже."""
+        old = Post.objects.create(author=self.author, text='Кот')
+        new = Post.objects.create(author=self.author, text='Кошка')
+        since = old.updated_at
+        Post.objects.filter(pk=old.pk).update(updated_at=since)
+        PostTerm.objects.all().delete()
+        call_command(
+            'rebuild_search_index', since=since.isoformat(),
+            stdout=StringIO(),
+        )
+        self.assertEqual(list(search('кошка')), [new])
+        self.assertEqual(list(search('кот')), [])
@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Comment, FeedItem, Follow, Group, Post
+from ..search import search
+from ..stats import recount
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedDataTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        options = dict(
+            users=30, groups=3, posts=200, comments=300, follows=5,
+            images=0.5, **options,
+        )
+        call_command('seed_data', stdout=StringIO(), **options)
+
+    def test_seed_data_creates_consistent_data(self):
+        """Команда создаёт данные нужного объёма, а счётчики, ленты
+        и поисковый индекс сходятся с ними."""
+        self.seed()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertEqual(recount(fix=False), 0)
+        self.assertGreater(
+            Post.objects.order_by('-pub_date')[0].pub_date,
+            Post.objects.order_by('pub_date')[0].pub_date,
+        )
+        follow = Follow.objects.first()
+        self.assertEqual(
+            set(FeedItem.objects.filter(
+                user=follow.user).values_list('post', flat=True)),
+            set(Post.objects.filter(
+                author__following__user=follow.user).values_list(
+                'pk', flat=True)),
+        )
+        post = Post.objects.first()
+        self.assertIn(post, search(post.text))
+
+    def test_seed_data_can_be_repeated(self):
+        """Повторный запуск добавляет данные к уже созданным."""
+        self.seed(seed=1)
+        self.seed(seed=1)
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Post.objects.count(), 400)
+        self.assertEqual(recount(fix=False), 0)
@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Follow, Post
+from ..stats import author_stats, recount
+
+User = get_user_model()
+
+
+class AuthorStatsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Yusuf')
+        self.follower = User.objects.create_user(username='Follower')
+
+    def get_stats(self):
+        return author_stats(User.objects.get(pk=self.author.pk))
+
+    def test_counters_follow_create_and_delete(self):
+        """Счётчики постов, комментариев и подписчиков меняются
+        при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.create(author=self.author, text='Ещё пост')
+        comment = Comment.objects.create(
+            post=post, author=self.follower, text='Комментарий')
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        stats = self.get_stats()
+        self.assertEqual(stats.posts_count, 2)
+        self.assertEqual(stats.followers_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.delete()
+        stats = self.get_stats()
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 0)
+
+    def test_author_without_stats_has_zero_counters(self):
+        """У автора без записи счётчики нулевые."""
+        stats = self.get_stats()
+        self.assertEqual(stats.posts_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+
+    def test_author_deletion_cascades(self):
+        """Удаление автора с постами не ломается на счётчиках."""
+        Post.objects.create(author=self.author, text='Пост')
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.author.delete()
+        self.assertFalse(
+            AuthorStats.objects.filter(user_id=self.author.pk).exists())
+
+    def test_recount_stats_repairs_drift(self):
+        """Команда recount_stats находит и исправляет расхождения."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(
+            post=post, author=self.follower, text='Комментарий')
+        Follow.objects.create(user=self.follower, author=self.author)
+        AuthorStats.objects.filter(user=self.author).update(
+            posts_count=10, followers_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+
+        out = StringIO()
+        call_command('recount_stats', '--dry-run', stdout=out)
+        self.assertIn('Найдено расхождений: 2', out.getvalue())
+        self.assertEqual(self.get_stats().posts_count, 10)
+
+        call_command('recount_stats', stdout=StringIO())
+        stats = self.get_stats()
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        out = StringIO()
+        call_command('recount_stats', stdout=out)
+        self.assertIn('Расхождений нет.', out.getvalue())
+
+    def test_recount_creates_many_missing_rows(self):
+        """recount создаёт сотни пропавших записей счётчиков, не упираясь
+        в лимит SQLite на число строк в одном INSERT."""
+        User.objects.bulk_create(
+            User(username=f'author{number}') for number in range(600))
+        authors = User.objects.filter(username__startswith='author')
+        Post.objects.bulk_create(
+            Post(author=author, text='Пост') for author in authors)
+        AuthorStats.objects.all().delete()
+        recount()
+        self.assertEqual(
+            AuthorStats.objects.filter(posts_count=1).count(), 600)
@@ -0,0 +1,124 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import Job
+
+from ..models import Post
+from ..thumbnails import cached_thumbnail, generate, thumbnail_variants
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Yusuf')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, name):
+        return SimpleUploadedFile(
+            name=name, content=SMALL_GIF, content_type='image/gif')
+
+    def test_post_create_generates_thumbnail(self):
+        """Миниатюра создаётся при публикации поста,
+        а не при первом показе ленты."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': self.upload('a.gif')},
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertIsNotNone(cached_thumbnail(post.image))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, '<img class="card-img my-2"')
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, выводится заглушка, а создание
+        миниатюры уходит в фоновый пул."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=self.upload('b.gif'))
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        with override_settings(THUMBNAIL_WORKERS=2), mock.patch(
+                'posts.thumbnails.transaction.on_commit',
+                side_effect=lambda func: func()), mock.patch(
+                'posts.thumbnails.get_executor') as get_executor:
+            response = self.authorized_client.get(url)
+        self.assertContains(response, 'bg-light')
+        self.assertNotContains(response, '<img class="card-img my-2"')
+        get_executor.return_value.submit.assert_called_once()
+        self.assertIsNone(cached_thumbnail(post.image))
+
+    def test_saved_post_thumbnail_goes_to_job_queue(self):
+        """При JOBS_ASYNC миниатюру нового поста создаёт воркер,
+        а показ страницы задания в очередь не добавляет."""
+        with override_settings(JOBS_ASYNC=True):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Пост', 'image': self.upload('d.gif')},
+            )
+            post = Post.objects.get(text='Пост')
+            self.assertTrue(Job.objects.filter(
+                name='posts.tasks.make_thumbnails').exists())
+            self.assertIsNone(cached_thumbnail(post.image))
+            call_command('run_jobs', once=True, stdout=StringIO())
+        self.assertIsNotNone(cached_thumbnail(post.image))
+
+    def test_generated_thumbnail_replaces_cached_placeholder(self):
+        """После создания миниатюры закэшированная лента
+        перестаёт показывать заглушку."""
+        Post.objects.create(
+            author=self.user, text='Пост', image=self.upload('c.gif'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'bg-light')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, '<img class="card-img my-2"')
+
+    def test_variants_are_served_through_srcset(self):
+        """Для картинки создаются варианты разной ширины в WebP и JPEG,
+        и они выводятся через srcset."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=self.upload('d.gif'))
+        generate(post)
+        variants = thumbnail_variants(post.image)
+        self.assertEqual(set(variants), {'WEBP', 'JPEG'})
+        for format_, files in variants.items():
+            for width, thumbnail in files:
+                with self.subTest(format=format_, width=width):
+                    self.assertTrue(thumbnail.exists())
+                    with default_storage.open(thumbnail.name) as file:
+                        self.assertEqual(
+                            get_image_dimensions(file)[0], width)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, 'type="image/webp"')
+        for width, thumbnail in variants['WEBP']:
+            self.assertContains(response, f'{thumbnail.url} {width}w')
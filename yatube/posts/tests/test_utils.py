@@ -0,0 +1,233 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..models import Follow, Post
+from ..utils import (
+    CachedCountPaginator, CursorPage, decode_cursor, encode_cursor,
+    followed_author_ids, is_following, pagination
+)
+
+User = get_user_model()
+
+
+class CursorPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Yusuf')
+        for i in range(25):
+            Post.objects.create(author=cls.user, text=f'Пост {i}')
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)
+        )
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get_page(self, **params):
+        request = self.factory.get('/', params)
+        return pagination(request, Post.objects.all(), cursor=True)
+
+    def test_cursor_round_trip(self):
+        """Курсор кодирует и раскодирует пару (pub_date, id)."""
+        post = Post.objects.first()
+        self.assertEqual(
+            decode_cursor(encode_cursor(post)), (post.pub_date, post.pk)
+        )
+        with self.assertRaises(ValueError):
+            decode_cursor('испорченный')
+
+    def test_walk_forward_and_back(self):
+        """По курсорам можно пройти ленту вперёд и назад
+        без пропусков и повторов."""
+        page = self.get_page()
+        self.assertIsInstance(page, CursorPage)
+        self.assertFalse(page.has_previous())
+        pages = [page]
+        while page.has_next():
+            page = self.get_page(after=page.next_cursor)
+            pages.append(page)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(
+            [post.pk for page in pages for post in page], self.expected
+        )
+        page = self.get_page(before=pages[-1].previous_cursor)
+        self.assertEqual(list(page), list(pages[1]))
+        page = self.get_page(before=page.previous_cursor)
+        self.assertEqual(list(page), list(pages[0]))
+        self.assertFalse(page.has_previous())
+
+    def test_cursor_page_constant_queries(self):
+        """Страница выбирается одним запросом без COUNT(*)."""
+        page = self.get_page()
+        page = self.get_page(after=page.next_cursor)
+        with self.assertNumQueries(1):
+            self.get_page(after=page.next_cursor)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор отдаёт первую страницу."""
+        page = self.get_page(after='испорченный')
+        self.assertEqual([post.pk for post in page], self.expected[:10])
+
+    def test_cursor_page_renders_in_paginator_template(self):
+        """Шаблон пагинатора выводит ссылки на соседние страницы."""
+        page = self.get_page()
+        page = self.get_page(after=page.next_cursor)
+        html = render_to_string(
+            'posts/includes/paginator.html', {'page_obj': page}
+        )
+        self.assertIn(f'?after={page.next_cursor}', html)
+        self.assertIn(f'?before={page.previous_cursor}', html)
+
+
+@override_settings(PAGINATOR_COUNT_TTL=60, PAGINATOR_COUNT_WORKERS=0)
+class CachedCountPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Yusuf')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}') for i in range(15))
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def get_page(self, page=1):
+        request = self.factory.get('/', {'page': page})
+        return pagination(request, Post.objects.all(), count_name='test')
+
+    def test_elided_page_range(self):
+        """Выводятся первая и последняя страницы и соседи текущей."""
+        paginator = CachedCountPaginator(Post.objects.all(), 10, count=1000)
+        ellipsis = paginator.ELLIPSIS
+        cases = (
+            (1, [1, 2, 3, ellipsis, 100]),
+            (50, [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100]),
+            (99, [1, ellipsis, 97, 98, 99, 100]),
+        )
+        for number, expected in cases:
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(paginator.get_elided_page_range(number)), expected)
+        paginator = CachedCountPaginator(Post.objects.all(), 10, count=50)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(3)), [1, 2, 3, 4, 5])
+
+    def test_count_is_cached(self):
+        """COUNT(*) выполняется один раз, дальше число берётся из кэша."""
+        self.assertEqual(self.get_page().paginator.count, 15)
+        Post.objects.create(author=self.user, text='Новый пост')
+        with self.assertNumQueries(1):
+            page = self.get_page()
+            self.assertEqual(page.paginator.count, 15)
+            self.assertEqual(len(page), 10)
+
+    def test_stale_count_is_refreshed(self):
+        """Устаревшее число пересчитывается, а страница за последней
+        известной пересчитывает его сразу."""
+        self.get_page()
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Новый пост {i}') for i in range(10))
+        page = self.get_page(3)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
+        Post.objects.create(author=self.user, text='Ещё пост')
+        with override_settings(PAGINATOR_COUNT_TTL=0):
+            self.get_page()
+        self.assertEqual(self.get_page().paginator.count, 26)
+
+    def test_pages_past_the_end_recount_rarely(self):
+        """Страницы за последней пересчитывают число не чаще раза
+        в PAGINATOR_COUNT_TTL, остальные получают последнюю страницу."""
+        self.get_page()
+        self.assertEqual(self.get_page(999999).paginator.count, 15)
+        Post.objects.create(author=self.user, text='Новый пост')
+        with self.assertNumQueries(1):
+            page = self.get_page(999999)
+            self.assertEqual(len(page), 6)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(page.paginator.count, 15)
+
+    def test_html_does_not_grow_with_pages(self):
+        """Ссылок на страницы одинаково мало при любом их числе."""
+        paginator = CachedCountPaginator(
+            Post.objects.all(), 10, count=1000000)
+        html = render_to_string(
+            'posts/includes/paginator.html',
+            {'page_obj': paginator.page(50000)},
+        )
+        self.assertIn('page=100000', html)
+        self.assertIn(paginator.ELLIPSIS, html)
+        self.assertLessEqual(html.count('class="page-link"'), 13)
+
+
+class FollowedAuthorsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}') for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Yusuf')
+        for author in self.authors[:3]:
+            Follow.objects.create(user=self.user, author=author)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_one_query_for_author_list(self):
+        """Подписки на список авторов проверяются одним запросом,
+        а из кэша - без запросов."""
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            following = [
+                is_following(user, author) for author in self.authors]
+        self.assertEqual(following, [True, True, True, False, False])
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(is_following(user, self.authors[0]))
+
+    def test_follow_and_unfollow_reset_cache(self):
+        """Подписка и отписка сбрасывают кэш подписчика."""
+        followed_author_ids(self.fresh_user())
+        Follow.objects.create(user=self.user, author=self.authors[3])
+        Follow.objects.filter(user=self.user, author=self.authors[0]).delete()
+        self.assertEqual(
+            followed_author_ids(self.fresh_user()),
+            {author.pk for author in self.authors[1:4]},
+        )
+
+    def test_stale_list_written_after_follow_is_not_read(self):
+        """Список, прочитанный из базы до подписки, а записанный в кэш
+        после неё, не возвращается следующим запросам."""
+        set_cache = cache.set
+        raced = []
+
+        def racing_set(*args, **kwargs):
+            # Подписка успевает между запросом к базе и записью в кэш.
+            if not raced:
+                raced.append(True)
+                Follow.objects.create(user=self.user, author=self.authors[3])
+            set_cache(*args, **kwargs)
+
+        with mock.patch.object(cache, 'set', racing_set):
+            self.assertNotIn(
+                self.authors[3].pk, followed_author_ids(self.fresh_user()))
+        self.assertIn(
+            self.authors[3].pk, followed_author_ids(self.fresh_user()))
+
+    def test_depends_on_viewer(self):
+        """Подписки другого пользователя и гостя не учитываются."""
+        other = User.objects.create_user(username='Other')
+        self.assertFalse(is_following(other, self.authors[0]))
+        self.assertFalse(is_following(AnonymousUser(), self.authors[0]))
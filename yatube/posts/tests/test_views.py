@@ -1,16 +1,28 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
-from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django import forms
 
-from ..models import Post, Group, Follow
+from core.testing import query_budget
+
+from ..cache import (
+    bump_version, cache_stats, fragment_key, get_or_render, get_version,
+    reset_cache_stats
+)
+from ..feed import follow_feed
+from ..models import Post, Group, Follow, Comment
+from ..stats import author_stats
+from ..views import profile_follow
 
 User = get_user_model()
 
@@ -278,19 +290,152 @@ class CacheTest(TestCase):
             text='произвольный текст'
         )
 
-    def test_cache_index_page(self):
-        key = make_template_fragment_key('index_page')
+    def test_index_page_is_served_from_cache(self):
+        """Главная отдаётся из кэша, пока данные не менялись."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'произвольный текст')
+        # update() не шлёт сигналов, версия кэша не меняется.
+        Post.objects.filter(pk=self.post.pk).update(text='новый текст')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'произвольный текст')
+        cache.clear()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'новый текст')
+
+    def test_index_cache_invalidated_on_change(self):
+        """Создание, правка и удаление поста сбрасывают кэш главной."""
         self.guest_client.get(reverse('posts:index'))
-        cache1 = cache.get(key)
-        my_post = Post.objects.get(id=self.post.pk)
-        my_post.delete()
+        post = Post.objects.create(author=self.user, text='свежий пост')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'свежий пост')
+        post.text = 'исправленный пост'
+        post.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'исправленный пост')
+        post.delete()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'исправленный пост')
+
+    def test_index_cache_depends_on_page(self):
+        """Каждая страница главной кэшируется отдельно."""
+        for i in range(10):
+            Post.objects.create(author=self.user, text=f'пост {i}')
         self.guest_client.get(reverse('posts:index'))
-        cache2 = cache.get(key)
-        self.assertEqual(cache1, cache2)
+        response = self.guest_client.get(reverse('posts:index') + '?page=2')
+        self.assertContains(response, 'произвольный текст')
+
+    def test_stale_fragment_served_while_rebuilding(self):
+        """Пока один запрос пересобирает страницу,
+        остальные получают предыдущую версию."""
+        self.assertEqual(
+            get_or_render('index', [1], lambda: 'старая'), 'старая')
+        bump_version('index')
+        key = f"{fragment_key('index', [1])}:{get_version('index')}"
+        cache.add(f'{key}:lock', 1)
+        self.assertEqual(
+            get_or_render('index', [1], lambda: 'новая'), 'старая')
+        cache.delete(f'{key}:lock')
+        self.assertEqual(
+            get_or_render('index', [1], lambda: 'новая'), 'новая')
+
+
+class GroupProfileCacheTest(TestCase):
+    def setUp(self):
         cache.clear()
-        self.guest_client.get(reverse('posts:index'))
-        cache3 = cache.get(key)
-        self.assertNotEqual(cache2, cache3)
+        self.guest_client = Client()
+        self.author = User.objects.create_user(username='Yusuf')
+        self.other_author = User.objects.create_user(username='Other')
+        self.group = Group.objects.create(title='Группа X', slug='group-x')
+        self.other_group = Group.objects.create(
+            title='Группа Y', slug='group-y')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='пост в X')
+        self.other_post = Post.objects.create(
+            author=self.other_author, group=self.other_group,
+            text='пост в Y')
+        self.urls = {
+            'group': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'other_group': reverse(
+                'posts:group_list', kwargs={'slug': self.other_group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': self.author.username}),
+            'other_profile': reverse(
+                'posts:profile',
+                kwargs={'username': self.other_author.username}),
+        }
+
+    def test_new_post_evicts_only_its_group_and_author(self):
+        """Новый пост в группе X сбрасывает страницы группы X и профиля
+        автора, но не трогает другую группу и чужой профиль."""
+        for url in self.urls.values():
+            self.guest_client.get(url)
+        # update() не шлёт сигналов: так видно, какие страницы из кэша.
+        Post.objects.update(text='изменено без сигналов')
+        Post.objects.create(
+            author=self.author, group=self.group, text='новый пост')
+        expected = {
+            'group': 'новый пост',
+            'profile': 'новый пост',
+            'other_group': 'пост в Y',
+            'other_profile': 'пост в Y',
+        }
+        for name, text in expected.items():
+            with self.subTest(page=name):
+                response = self.guest_client.get(self.urls[name])
+                self.assertContains(response, text)
+
+    def test_moving_post_evicts_old_group(self):
+        """Перенос поста в другую группу сбрасывает обе группы."""
+        self.guest_client.get(self.urls['group'])
+        self.post.group = self.other_group
+        self.post.save()
+        response = self.guest_client.get(self.urls['group'])
+        self.assertNotContains(response, 'пост в X')
+
+    def test_hits_and_misses_are_counted(self):
+        """Попадания и промахи кэша считаются по видам страниц."""
+        reset_cache_stats()
+        self.guest_client.get(self.urls['group'])
+        self.guest_client.get(self.urls['group'])
+        self.guest_client.get(self.urls['profile'])
+        stats = cache_stats()
+        self.assertEqual(stats['group'], {'hits': 1, 'misses': 1})
+        self.assertEqual(stats['profile'], {'hits': 0, 'misses': 1})
+        out = StringIO()
+        call_command('cache_stats', stdout=out)
+        self.assertIn('group: попаданий 1, промахов 1', out.getvalue())
+
+
+class SharedCacheBackendTest(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.user = User.objects.create_user(username='Yusuf')
+        self.post = Post.objects.create(author=self.user, text='старый текст')
+
+    def test_versioned_cache_works_on_shared_backends(self):
+        """Кэш лент работает на общих для процессов бэкендах."""
+        for backend in ('file', 'db'):
+            caches = {'default': settings.CACHE_BACKENDS[backend]}
+            if backend == 'file':
+                caches['default'] = dict(
+                    caches['default'], LOCATION=tempfile.mkdtemp())
+            with self.subTest(backend=backend), override_settings(
+                    CACHES=caches):
+                if backend == 'db':
+                    call_command('createcachetable', verbosity=0)
+                cache.clear()
+                self.guest_client.get(reverse('posts:index'))
+                Post.objects.update(text='новый текст')
+                response = self.guest_client.get(reverse('posts:index'))
+                self.assertContains(response, 'старый текст')
+                bump_version('index')
+                response = self.guest_client.get(reverse('posts:index'))
+                self.assertContains(response, 'новый текст')
+                Post.objects.update(text='старый текст')
+                cache.clear()
+                if backend == 'file':
+                    shutil.rmtree(caches['default']['LOCATION'])
 
 
 class FollowTest(TestCase):
@@ -354,3 +499,298 @@ class FollowTest(TestCase):
             f'?next='
             f'{reverse("posts:profile_follow", args=[self.author.username])}'
         )
+
+
+class FollowActionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.follower = User.objects.create_user(username='Follower')
+        self.author = User.objects.create_user(username='Yusuf')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.client.force_login(self.follower)
+        self.follow_url = reverse(
+            'posts:profile_follow', kwargs={'username': 'Yusuf'})
+        self.unfollow_url = reverse(
+            'posts:profile_unfollow', kwargs={'username': 'Yusuf'})
+
+    def followers_count(self):
+        return author_stats(
+            User.objects.select_related('stats').get(pk=self.author.pk)
+        ).followers_count
+
+    def feed(self):
+        return list(follow_feed(self.follower))
+
+    def test_follow_and_unfollow_are_idempotent(self):
+        """Повторная подписка и отписка ничего не меняют, ответ -
+        редирект в профиль."""
+        for _ in range(2):
+            response = self.client.post(self.follow_url)
+            self.assertRedirects(response, reverse(
+                'posts:profile', kwargs={'username': 'Yusuf'}))
+        self.assertEqual(
+            Follow.objects.filter(user=self.follower).count(), 1)
+        self.assertEqual(self.followers_count(), 1)
+        self.assertEqual(self.feed(), [self.post])
+        for _ in range(2):
+            self.client.post(self.unfollow_url)
+        self.assertFalse(Follow.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.followers_count(), 0)
+        self.assertEqual(self.feed(), [])
+
+    def test_side_effects_run_after_response(self):
+        """Счётчик и лента обновляются при закрытии ответа."""
+        request = RequestFactory().post(self.follow_url)
+        request.user = self.follower
+        response = profile_follow(request, 'Yusuf')
+        self.assertTrue(
+            Follow.objects.filter(
+                user=self.follower, author=self.author).exists())
+        self.assertEqual(self.followers_count(), 0)
+        response.close()
+        self.assertEqual(self.followers_count(), 1)
+        self.assertEqual(self.feed(), [self.post])
+
+    def test_json_response_and_self_follow(self):
+        """Скрипты получают JSON; подписаться на себя нельзя."""
+        response = self.client.post(
+            self.follow_url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json(), {'following': True})
+        self.client.force_login(self.author)
+        response = self.client.post(
+            self.follow_url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json(), {'following': False})
+        self.assertFalse(Follow.objects.filter(user=self.author).exists())
+
+    def test_profile_shows_follow_state_of_viewer(self):
+        """Кнопка в профиле зависит от подписок смотрящего."""
+        profile_url = reverse('posts:profile', kwargs={'username': 'Yusuf'})
+        self.client.post(self.follow_url)
+        self.assertTrue(self.client.get(profile_url).context['following'])
+        other = Client()
+        other.force_login(User.objects.create_user(username='Other'))
+        self.assertFalse(other.get(profile_url).context['following'])
+
+
+class PostDetailQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Yusuf')
+        cls.group = Group.objects.create(
+            title='Заголовок группы',
+            slug='group-slag',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Пост с комментариями',
+        )
+        cls.commentators = [
+            User.objects.create_user(username=f'user_{i}') for i in range(10)
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.guest_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_post_detail_queries_do_not_depend_on_comments(self):
+        """Страница поста с 500 комментариями выполняет столько же
+        запросов, сколько страница с одним комментарием."""
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        queries_with_one_comment = self.count_queries()
+        Comment.objects.bulk_create(
+            Comment(
+                post=self.post,
+                author=self.commentators[i % 10],
+                text=f'Комментарий {i}',
+            )
+            for i in range(499)
+        )
+        with query_budget(queries=queries_with_one_comment):
+            response = self.guest_client.get(self.url)
+        self.assertEqual(len(response.context['comments']), 500)
+        # Пост с автором и комментарии, третий запрос - ETag.
+        self.assertLessEqual(queries_with_one_comment, 3)
+
+    def test_post_detail_shows_author_posts_count(self):
+        """Число постов автора приходит вместе с постом."""
+        Post.objects.create(author=self.user, text='Ещё один пост')
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response.context['author_stats'].posts_count, 2)
+
+
+class ViewQueryBudgetTest(TestCase):
+    """Бюджеты запросов страниц: число запросов не должно расти
+    с числом постов и комментариев на странице. В шаблонах остаются
+    только ленивые сессия, пользователь и выборка страницы."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Yusuf')
+        cls.group = Group.objects.create(
+            title='Заголовок группы',
+            slug='group-slag',
+        )
+        authors = [
+            User.objects.create_user(username=f'author_{i}') for i in range(5)
+        ]
+        for i in range(15):
+            post = Post.objects.create(
+                author=authors[i % 5],
+                group=cls.group,
+                text=f'Пост {i}',
+            )
+            Follow.objects.get_or_create(user=cls.user, author=post.author)
+            Comment.objects.create(
+                post=post, author=authors[(i + 1) % 5], text='Комментарий')
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get(self, url):
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    @query_budget(queries=4, render_queries=3, time=100)
+    def test_index_budget(self):
+        self.get(reverse('posts:index'))
+
+    # В бюджетах group_list, profile и post_detail один запрос - ETag.
+    @query_budget(queries=6, render_queries=3, time=100)
+    def test_group_list_budget(self):
+        self.get(reverse('posts:group_list', kwargs={'slug': 'group-slag'}))
+
+    @query_budget(queries=7, render_queries=3, time=100)
+    def test_profile_budget(self):
+        self.get(reverse(
+            'posts:profile', kwargs={'username': self.post.author.username}))
+
+    @query_budget(queries=5, render_queries=3, time=100)
+    def test_post_detail_budget(self):
+        self.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+
+    @query_budget(queries=5, render_queries=1, time=100)
+    def test_follow_index_budget(self):
+        self.get(reverse('posts:follow_index'))
+
+    def test_budget_reports_duplicated_queries(self):
+        """При превышении бюджета видны повторяющиеся запросы."""
+        with self.assertRaisesMessage(AssertionError, '15 x SELECT'):
+            with query_budget(queries=3):
+                for post in Post.objects.all():
+                    post.author.username
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Yusuf')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Заголовок группы',
+            slug='group-slag',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Текст поста')
+
+    def setUp(self):
+        cache.clear()
+        self.urls = (
+            reverse('posts:group_list', kwargs={'slug': 'group-slag'}),
+            reverse('posts:profile', kwargs={'username': 'Yusuf'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def etags(self, client=None):
+        client = client or self.client
+        return [client.get(url)['ETag'] for url in self.urls]
+
+    def test_not_modified_without_rendering(self):
+        """Повторный запрос с тем же ETag получает 304 без рендера
+        шаблонов."""
+        for url, etag in zip(self.urls, self.etags()):
+            with self.subTest(url=url):
+                with query_budget(queries=1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                self.assertEqual(response.content, b'')
+
+    def edit_post(self):
+        self.post.text = 'Правка'
+        self.post.save()
+
+    def test_etag_changes_with_data(self):
+        """ETag меняется при новом посте, правке, новом комментарии
+        и у другого пользователя."""
+        changes = (
+            lambda: Post.objects.create(
+                author=self.user, group=self.group, text='Новый пост'),
+            self.edit_post,
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'),
+        )
+        for change in changes:
+            before = self.etags()
+            change()
+            self.assertNotEqual(self.etags()[2], before[2])
+        before = self.etags()
+        Post.objects.create(
+            author=self.user, group=self.group, text='Ещё пост')
+        after = self.etags()
+        self.assertNotEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        for anonymous, reader in zip(after, self.etags(reader_client)):
+            self.assertNotEqual(anonymous, reader)
+
+    def test_etag_without_aggregates(self):
+        """ETag строится по счётчикам и версиям кэша, без агрегатов
+        по постам и комментариям, и всё равно меняется при удалении."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        other_post = Post.objects.create(
+            author=self.user, group=self.group, text='Другой пост')
+        before = self.etags()
+        for url, etag in zip(self.urls, before):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                for query in queries:
+                    self.assertNotIn('COUNT(', query['sql'])
+                    self.assertNotIn('MAX(', query['sql'])
+        comment.delete()
+        self.assertNotEqual(self.etags()[2], before[2])
+        other_post.delete()
+        after = self.etags()
+        self.assertNotEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
+
+    def test_missing_objects(self):
+        """Для несуществующих страниц ETag нет, ответ 404."""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': 'no-group'}),
+            reverse('posts:profile', kwargs={'username': 'nobody'}),
+            reverse('posts:post_detail', kwargs={'post_id': 10000}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='"x"')
+                self.assertEqual(response.status_code, 404)
+                self.assertFalse(response.has_header('ETag'))
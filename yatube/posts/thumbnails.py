@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.metrics import thumbnail_duration
+from core.profiling import section
+
+from .cache import bump_version, post_scopes
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+# Ширины вариантов для srcset и форматы; основной вариант (JPEG 960)
+# создаётся последним, поэтому его наличие значит, что готовы все.
+WIDTHS = (480, 768, 960)
+FORMATS = ('WEBP', 'JPEG')
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def thumbnail_options(source, options):
+    """Повторяет подготовку опций sorl, чтобы имя файла миниатюры
+    совпадало с тем, что дал бы {% thumbnail %}."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, geometry, options):
+    source = ImageFile(image)
+    options = thumbnail_options(source, options or OPTIONS)
+    name = default.backend._get_thumbnail_filename(source, geometry, options)
+    return source, options, ImageFile(name, default.storage)
+
+
+def cached_thumbnail(image, geometry=GEOMETRY, **options):
+    """Готовая основная миниатюра или None. Сама миниатюру никогда
+    не создаёт и не ходит в базу: проверяется только наличие файла."""
+    _, _, variant, variant_options = variant_specs(geometry, options)[-1]
+    thumbnail = thumbnail_file(image, variant, variant_options)[2]
+    return thumbnail if thumbnail.exists() else None
+
+
+def variant_geometry(width, geometry=GEOMETRY):
+    base_width, base_height = (int(size) for size in geometry.split('x'))
+    return f'{width}x{round(base_height * width / base_width)}'
+
+
+def variant_specs(geometry=GEOMETRY, options=None):
+    """Геометрия и опции всех вариантов, основной - последним."""
+    options = options or OPTIONS
+    base_width = int(geometry.split('x')[0])
+    specs = []
+    for format_ in FORMATS:
+        for width in WIDTHS:
+            if width > base_width:
+                continue
+            specs.append((
+                format_,
+                width,
+                variant_geometry(width, geometry),
+                dict(options, format=format_),
+            ))
+    return specs
+
+
+def thumbnail_variants(image, geometry=GEOMETRY, **options):
+    """Файлы вариантов по форматам: {'WEBP': [(480, file), ...], ...}.
+    Только вычисляет имена, существование файлов не проверяет."""
+    variants = {}
+    for format_, width, variant, variant_options in variant_specs(
+            geometry, options):
+        thumbnail = thumbnail_file(image, variant, variant_options)[2]
+        variants.setdefault(format_, []).append((width, thumbnail))
+    return variants
+
+
+def generate(post, geometry=GEOMETRY, **options):
+    """Создаёт все варианты миниатюры и сбрасывает кэш страниц
+    с заглушкой. Работает только с файлами, поэтому безопасна
+    в фоновом потоке."""
+    source_image = None
+    started = time.perf_counter()
+    try:
+        for _, _, variant, variant_options in variant_specs(
+                geometry, options):
+            source, variant_options, thumbnail = thumbnail_file(
+                post.image, variant, variant_options)
+            if thumbnail.exists():
+                continue
+            if source_image is None:
+                # Оригинал декодируется один раз на все варианты.
+                source_image = default.engine.get_image(source)
+                image_info = default.engine.get_image_info(source_image)
+            variant_options['image_info'] = image_info
+            default.backend._create_thumbnail(
+                source_image, variant, variant_options, thumbnail)
+        if source_image is not None:
+            thumbnail_duration.observe(time.perf_counter() - started)
+        bump_version(*post_scopes(post))
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', post.image.name)
+    finally:
+        if source_image is not None:
+            default.engine.cleanup(source_image)
+        with _lock:
+            _pending.discard((post.image.name, geometry))
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def enqueue(post, geometry=GEOMETRY, **options):
+    """Ставит создание миниатюры картинки поста в фоновый пул.
+    При THUMBNAIL_WORKERS = 0 миниатюра создаётся сразу."""
+    if not post.image:
+        return
+    key = (post.image.name, geometry)
+    with _lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    if not settings.THUMBNAIL_WORKERS:
+        with section('thumbnails'):
+            generate(post, geometry, **options)
+        return
+    # Фоновый поток не должен читать файл незакоммиченного поста.
+    transaction.on_commit(
+        lambda: get_executor().submit(generate, post, geometry, **options)
+    )
+
+
+def schedule(post):
+    """Миниатюра сохранённого поста: при JOBS_ASYNC = True её создаёт
+    воркер run_jobs, иначе - как в enqueue. Шаблоны вызывают enqueue,
+    чтобы показ страницы не добавлял задания в базу."""
+    if not post.image:
+        return
+    if settings.JOBS_ASYNC:
+        # Модуль задач сам импортирует этот модуль.
+        from .tasks import make_thumbnails
+        make_thumbnails.defer(post.pk)
+        return
+    enqueue(post)
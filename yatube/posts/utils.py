@@ -1,15 +1,258 @@
-from django.core.paginator import Paginator
+from itertools import islice
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .cache import (
+    bump_version, cached_count, following_scope, get_version, recount
+)
 from .models import Follow
 
+POSTS_PER_PAGE = 10
+# Сколько номеров страниц выводится по сторонам от текущей и по краям.
+PAGES_ON_EACH_SIDE = 2
+PAGES_ON_ENDS = 1
+
+
+def following_key(user_id):
+    version = get_version(following_scope(user_id))
+    return f'posts:following:{user_id}:{version}'
+
+
+def followed_author_ids(user):
+    """Id авторов, на которых подписан user. Загружаются одним запросом,
+    хранятся в кэше до подписки или отписки и в объекте пользователя
+    до конца запроса, поэтому проверки для списка авторов
+    не ходят в базу.
+
+    Ключ кэша содержит версию подписок: список, прочитанный из базы
+    до подписки, но записанный после неё, ляжет под старую версию
+    и больше не прочитается."""
+    if not user.is_authenticated:
+        return frozenset()
+    ids = getattr(user, '_followed_author_ids', None)
+    if ids is None:
+        key = following_key(user.pk)
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(
+                Follow.objects.filter(user=user).values_list(
+                    'author', flat=True)
+            )
+            cache.set(key, ids, settings.POSTS_CACHE_TIMEOUT)
+        user._followed_author_ids = ids
+    return ids
+
+
+def forget_followed_authors(user_id):
+    scope = following_scope(user_id)
+    bump_version(scope)
+    # Внутри транзакции другой запрос ещё видит старые подписки
+    # и может закэшировать их под новой версией - сдвигаем её
+    # ещё раз после фиксации.
+    transaction.on_commit(lambda: bump_version(scope))
+
+
+def is_following(user, author):
+    return author.pk in followed_author_ids(user)
+
+
+def encode_cursor(post):
+    """Кодирует позицию поста (pub_date, id) в строку для URL."""
+    value = f'{post.pub_date.isoformat()}|{post.pk}'
+    return urlsafe_base64_encode(value.encode())
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор обратно в пару (pub_date, id).
+    Для испорченного курсора поднимает ValueError."""
+    try:
+        pub_date, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, UnicodeDecodeError, ValueError):
+        raise ValueError(f'Некорректный курсор: {cursor!r}')
+    if pub_date is None:
+        raise ValueError(f'Некорректный курсор: {cursor!r}')
+    return pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации. Не знает своего номера и общего
+    числа страниц, зато умеет отдавать курсоры соседних страниц."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        super().__init__(object_list, None, paginator)
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self)} objects>'
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous() and self.object_list:
+            return encode_cursor(self.object_list[0])
+        return None
+
+    @property
+    def next_cursor(self):
+        if self.has_next() and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор по паре (pub_date, id).
+    Не выполняет COUNT(*) и OFFSET, поэтому любая страница
+    выбирается за одно и то же время независимо от глубины."""
+
+    def get_page(self, after=None, before=None):
+        queryset = self.object_list
+        try:
+            if before:
+                pub_date, pk = decode_cursor(before)
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date)
+                    | Q(pub_date=pub_date, pk__gt=pk)
+                ).order_by('pub_date', 'pk')
+            elif after:
+                pub_date, pk = decode_cursor(after)
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date)
+                    | Q(pub_date=pub_date, pk__lt=pk)
+                ).order_by('-pub_date', '-pk')
+            else:
+                queryset = queryset.order_by('-pub_date', '-pk')
+        except ValueError:
+            # Испорченный курсор - отдаём первую страницу.
+            before = after = None
+            queryset = self.object_list.order_by('-pub_date', '-pk')
+        # Лишняя запись показывает, есть ли страница дальше.
+        posts = list(queryset[:self.per_page + 1])
+        has_more = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+        if before:
+            posts.reverse()
+            return CursorPage(
+                posts, self, has_previous=has_more, has_next=True
+            )
+        return CursorPage(
+            posts, self, has_previous=bool(after), has_next=has_more
+        )
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор без COUNT(*) на каждый запрос: число записей
+    передаётся готовым (count, например из счётчика автора) или берётся
+    из кэша под именем count_name. Номера страниц выводятся только
+    рядом с текущей и по краям, поэтому размер HTML не зависит
+    от числа страниц."""
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count=None, count_name=None):
+        super().__init__(object_list, per_page)
+        self.known_count = count
+        self.count_name = count_name
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.count_name is not None:
+            return cached_count(self.count_name, self.object_list.count)
+        return self.object_list.count()
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if (
+                self.known_count is not None
+                or self.count_name is None
+                or int(number) < 1
+            ):
+                raise
+            # Число в кэше могло отстать от новых записей.
+            count = recount(self.count_name, self.object_list.count)
+            if count is None:
+                raise
+        self.count = count
+        self.__dict__.pop('num_pages', None)
+        self.count_name = None
+        return super().validate_number(number)
+
+    def page(self, number):
+        # Срез не обрезается по числу записей: оно может быть неточным.
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self)
+
+    def _get_page(self, *args, **kwargs):
+        # Обычный Page: его тип проверяют тесты и сторонний код.
+        page = super()._get_page(*args, **kwargs)
+        page.page_window = list(self.get_elided_page_range(page.number))
+        return page
+
+    def get_elided_page_range(
+        self, number=1, on_each_side=PAGES_ON_EACH_SIDE,
+        on_ends=PAGES_ON_ENDS,
+    ):
+        """Номера страниц: первые и последние on_ends, по on_each_side
+        вокруг number, пропуски - ELLIPSIS."""
+        num_pages = self.num_pages
+        if num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            yield from range(number + 1, num_pages + 1)
+
 
-def is_following(author):
-    following = Follow.objects.filter(author=author).exists()
-    return following
+def batched(iterable, size):
+    """Разбивает итерируемое на списки не длиннее size."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
 
-def pagination(request, posts):
-    paginator = Paginator(posts, 10)
+def pagination(request, posts, cursor=False, count=None, count_name=None):
+    """Страница постов из запроса. count - уже известное число постов,
+    count_name - имя, под которым число кэшируется."""
+    if cursor:
+        paginator = CursorPaginator(posts, POSTS_PER_PAGE)
+        return paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    paginator = CachedCountPaginator(
+        posts, POSTS_PER_PAGE, count=count, count_name=count_name)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
@@ -1,15 +1,29 @@
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.defaultfilters import truncatewords
+from django.utils import timezone
+from django.views.decorators.http import etag, require_http_methods
 
+from core.deferred import after_response
+
+from . import tasks
+from .cache import group_scope, profile_scope
+from .conditional import group_posts_etag, post_detail_etag, profile_etag
+from .export import FORMATS, export_stream
+from .feed import follow_feed
+from .follows import follow, unfollow
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow, Comment
+from .models import Post, Group, User
+from .search import search as search_posts
+from .stats import author_stats
+from .thumbnails import schedule as schedule_thumbnail
 from .utils import pagination, is_following
 
 
 def index(request):
     posts = Post.objects.select_related('author', 'group')
-    page_obj = pagination(request, posts)
+    page_obj = pagination(request, posts, count_name='index')
     context = {
         'page_obj': page_obj,
         'title': 'Последние обновления на сайте',
@@ -17,38 +31,61 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@etag(group_posts_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group__slug=slug).select_related('group')
-    page_obj = pagination(request, posts)
+    posts = Post.objects.filter(group=group).select_related(
+        'author', 'group')
+    page_obj = pagination(request, posts, count_name=group_scope(group.pk))
     context = {
         'group': group,
         'page_obj': page_obj,
         'title': f'Записи сообщества {group.title}',
+        'cache_scope': group_scope(group.pk),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@etag(profile_etag)
 def profile(request, username):
-    post_author = get_object_or_404(User, username=username)
+    post_author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     posts = Post.objects.filter(
-        author__username=username).select_related('author')
-    page_obj = pagination(request, posts)
-    count = posts.count()
-    following = is_following(post_author)
+        author=post_author).select_related('author', 'group')
+    stats = author_stats(post_author)
+    page_obj = pagination(request, posts, count=stats.posts_count)
+    following = is_following(request.user, post_author)
     context = {
         'username': post_author,
         'title': f'Профайл пользователя {post_author}',
         'page_obj': page_obj,
-        'count': count,
-        'following': following
+        'count': stats.posts_count,
+        'stats': stats,
+        'following': following,
+        'cache_scope': profile_scope(post_author.pk),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(query).select_related('author', 'group')
+    page_obj = pagination(request, posts)
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'title': f'Поиск: {query}' if query else 'Поиск',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@etag(post_detail_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all().filter(post_id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id,
+    )
+    comments = post.comments.select_related('author').order_by('pub_date')
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
@@ -56,6 +93,7 @@ def post_detail(request, post_id):
         'form': form,
         'comments': comments,
         'post_author': post.author,
+        'author_stats': author_stats(post.author),
     }
     return render(request, 'posts/post_detail.html', context)
 
@@ -70,6 +108,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        schedule_thumbnail(post)
         return redirect('posts:profile', username=request.user)
     context = {
         'form': form,
@@ -90,7 +129,7 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        schedule_thumbnail(form.save())
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -115,8 +154,9 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = pagination(request, posts)
+    posts = follow_feed(request.user).select_related('author', 'group')
+    page_obj = pagination(
+        request, posts, count_name=f'follow:{request.user.pk}')
     context = {
         'page_obj': page_obj,
         'title': 'Избранное'
@@ -124,42 +164,56 @@ def follow_index(request):
     return render(request, 'posts/follow.html', context)
 
 
+def follow_response(request, author, following):
+    """Ответ на подписку: JSON для скриптов, иначе редирект в профиль."""
+    if 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse({'following': following})
+    return redirect('posts:profile', username=author.username)
+
+
 @login_required
+@require_http_methods(['GET', 'POST'])
 def profile_follow(request, username):
-    user = get_object_or_404(User, username=request.user)
     author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author).all()
-    page_obj = pagination(request, posts)
-    count = posts.count()
-    if author != request.user:
-        Follow.objects.get_or_create(
-            user=user,
-            author=author
-        )
-    following = is_following(username)
-    context = {
-        'username': author,
-        'page_obj': page_obj,
-        'count': count,
-        'following': following,
-        'title': f'Вы подписались на автора {author}'
-    }
-    return render(request, 'posts/profile.html', context)
+    if author == request.user:
+        return follow_response(request, author, False)
+    response = follow_response(request, author, True)
+    if follow(request.user, author):
+        after_response(
+            response, tasks.followed.defer, request.user.pk, author.pk)
+    return response
 
 
 @login_required
+@require_http_methods(['GET', 'POST'])
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    user = get_object_or_404(User, username=request.user)
-    follow_user = Follow.objects.filter(
-        user=user,
-        author=author
-    ).delete()
-    following = is_following(username)
-    context = {
-        'username': author,
-        'follow_user': follow_user,
-        'following': following,
-        'title': f'Вы отписались от автора {author}'
-    }
-    return render(request, 'posts/profile.html', context)
+    response = follow_response(request, author, False)
+    if unfollow(request.user, author):
+        after_response(
+            response, tasks.unfollowed.defer, request.user.pk, author.pk)
+    return response
+
+
+@login_required
+def export_data(request):
+    """Выгрузка постов, комментариев и подписок пользователя потоком:
+    ?format=ndjson|csv, ?gzip=1 - сжать."""
+    format_ = request.GET.get('format', 'ndjson')
+    if format_ not in FORMATS:
+        raise Http404('Неизвестный формат выгрузки')
+    compress = request.GET.get('gzip') == '1'
+    filename = (
+        f'yatube-{request.user.username}-'
+        f'{timezone.now():%Y-%m-%d}.{format_}'
+    )
+    content_type = f'{FORMATS[format_]}; charset=utf-8'
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(
+        export_stream(request.user, format_, compress),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
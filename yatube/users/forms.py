@@ -2,6 +2,8 @@ from django.contrib.auth.forms import UserCreationForm, PasswordChangeForm, \
     PasswordResetForm
 from django.contrib.auth import get_user_model
 
+from .tasks import send_password_reset
+
 
 User = get_user_model()
 
@@ -23,6 +25,26 @@ class ResetPasswordForm(PasswordResetForm):
         model = User
         fields = ('email',)
 
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        """Письмо отправляется через очередь задач. Токен в очередь
+        не попадает: воркер создаёт его сам по id пользователя."""
+        send_password_reset.defer(
+            context['user'].pk,
+            [
+                subject_template_name,
+                email_template_name,
+                html_email_template_name,
+            ],
+            from_email,
+            {
+                'domain': context['domain'],
+                'site_name': context['site_name'],
+                'protocol': context['protocol'],
+            },
+        )
+
 
 class ResetPasswordConfirmForm(PasswordResetForm):
     class Meta:
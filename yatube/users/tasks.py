@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives
+from django.template import loader
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.jobs import task
+
+User = get_user_model()
+
+
+@task(priority=20, max_attempts=10)
+def send_password_reset(user_id, templates, from_email, site):
+    """Письмо сброса пароля. Ссылка с токеном собирается здесь, чтобы
+    не храниться в очереди: в задании только id и имена шаблонов."""
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    subject_template_name, email_template_name, html_template_name = (
+        templates)
+    context = {
+        'email': getattr(user, User.get_email_field_name()),
+        'domain': site['domain'],
+        'site_name': site['site_name'],
+        'protocol': site['protocol'],
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'user': user,
+        'token': default_token_generator.make_token(user),
+    }
+    subject = ''.join(
+        loader.render_to_string(subject_template_name, context).splitlines()
+    )
+    body = loader.render_to_string(email_template_name, context)
+    message = EmailMultiAlternatives(
+        subject, body, from_email, [context['email']])
+    if html_template_name is not None:
+        message.attach_alternative(
+            loader.render_to_string(html_template_name, context), 'text/html')
+    message.send()
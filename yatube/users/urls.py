@@ -2,6 +2,7 @@ from django.contrib.auth.views import LogoutView, LoginView, \
     PasswordChangeView, PasswordResetView
 from django.urls import path
 from . import views
+from .forms import ResetPasswordForm
 
 
 app_name = 'users'
@@ -30,6 +31,7 @@ urlpatterns = [
          ),
     path('password_reset/',
          PasswordResetView.as_view(
+             form_class=ResetPasswordForm,
              template_name='users/password_reset_form.html'),
          name='password_reset'
          ),
@@ -0,0 +1,21 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 2.2 has no native ASGI support, so the WSGI application is wrapped
+in ``core.asgi.ASGIHandler``: views run in a pool of ``ASGI_THREADS``
+threads while request bodies and responses are handled by the event loop.
+Run with any ASGI server, e.g. ``uvicorn yatube.asgi:application``.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+from core.asgi import ASGIHandler  # noqa: E402
+
+application = ASGIHandler(get_wsgi_application(), settings.ASGI_THREADS)
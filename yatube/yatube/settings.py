@@ -11,6 +11,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -51,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.SampledProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +95,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Размер пула потоков, в котором yatube.asgi выполняет view.
+# Ограничивает и число одновременных подключений к базе.
+ASGI_THREADS = 8
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -153,8 +162,85 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
+# Бэкенд кэша выбирается переменной окружения YATUBE_CACHE.
+# locmem - свой кэш у каждого процесса, годится для разработки;
+# file (каталог YATUBE_CACHE_DIR) и db (таблица YATUBE_CACHE_TABLE) -
+# общий кэш для нескольких процессов на одном хосте
+# (для db нужен manage.py createcachetable);
+# redis (адрес YATUBE_REDIS_URL) - общий кэш для нескольких хостов,
+# нужен пакет django-redis.
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'yatube_cache'),
+        ),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_TABLE', 'yatube_cache'),
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_REDIS_URL', 'redis://127.0.0.1:6379/1'
+        ),
+    },
+}
+
+CACHE = os.environ.get('YATUBE_CACHE', 'locmem')
+if CACHE not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f'Неизвестный кэш YATUBE_CACHE={CACHE!r}, допустимые значения: '
+        + ', '.join(CACHE_BACKENDS)
+    )
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE],
 }
+
+# Авторы с большим числом подписчиков не раскладывают посты по лентам
+# при публикации, их посты подмешиваются в ленту при чтении.
+FEED_FANOUT_LIMIT = 1000
+
+# Закэшированные страницы лент живут до изменения данных,
+# таймаут только ограничивает хранение устаревших версий.
+POSTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Миниатюры картинок создаются в фоновом пуле потоков,
+# при 0 - сразу, в потоке запроса.
+THUMBNAIL_WORKERS = 2
+
+# Число записей для пагинатора лент берётся из кэша и пересчитывается
+# в фоне, если старше PAGINATOR_COUNT_TTL секунд (при 0 воркеров - сразу).
+PAGINATOR_COUNT_TTL = 60
+PAGINATOR_COUNT_WORKERS = 1
+
+# Доля запросов, которые замеряет SampledProfilingMiddleware (0 - выключено).
+# Для замеренных запросов дольше PROFILING_SLOW_MS в PROFILING_DIR
+# пишутся свёрнутые стеки, снятые раз в PROFILING_INTERVAL_MS.
+PROFILING_SAMPLE_RATE = float(
+    os.environ.get('YATUBE_PROFILING_SAMPLE_RATE', 0)
+)
+PROFILING_SLOW_MS = 500
+PROFILING_INTERVAL_MS = 5
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# Доступ к /metrics/. Если задан METRICS_TOKEN, Prometheus передаёт его
+# в заголовке Authorization: Bearer, и адрес не проверяется. Иначе
+# пускаются адреса из METRICS_ALLOWED_IPS - только без обратного
+# прокси: за ним REMOTE_ADDR у всех запросов адрес прокси.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+# Побочные действия запросов (миниатюры, счётчики, ленты, поисковый
+# индекс, почта) при JOBS_ASYNC выполняет воркер manage.py run_jobs,
+# иначе - сразу, в потоке запроса. Упавшее задание повторяется через
+# JOB_RETRY_DELAY секунд, с каждой попыткой вдвое позже; задание
+# дольше JOB_LOCK_TIMEOUT секунд в работе считается брошенным.
+JOBS_ASYNC = bool(int(os.environ.get('YATUBE_JOBS_ASYNC', 0)))
+JOB_RETRY_DELAY = 10
+JOB_LOCK_TIMEOUT = 5 * 60
@@ -17,6 +17,8 @@ from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics
+
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
@@ -24,6 +26,7 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics/', metrics, name='metrics'),
 ]
 
 handler404 = 'core.views.page_not_found'